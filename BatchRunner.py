@@ -0,0 +1,156 @@
+import time
+
+from RoomNumber import initial_matrix
+
+# One command per line, arguments separated by whitespace; blank lines and
+# lines starting with '#' are skipped.
+#   way NAME                  add an arrival way
+#   remove-way NAME           remove an arrival way
+#   initial N                 N initial guests
+#   add C1 C2 ...             new arrival epoch with Ci guests on way i (menu option 1)
+#   guest V1 V2 ...           one guest with these way values in the current epoch
+#   nested-add C1 C2 ...      new arrival epoch of nested guests (menu option 13)
+#   manual ROOM [replace]     manual room, replacing an occupant only if asked
+#   search ROOM
+#   delete ROOM
+#   track WAY VALUE [HI]      rooms with WAY == VALUE, or VALUE <= WAY <= HI
+#   range LO HI               occupied rooms numbered LO..HI
+#   count
+#   export PATH
+#   snapshot PATH
+COMMANDS = ("way", "remove-way", "initial", "add", "guest", "nested-add", "manual", "search", "delete",
+            "track", "range", "count", "export", "snapshot")
+
+
+def parse_command(line):
+    parts = line.split()
+    if not parts or parts[0].startswith("#"):
+        return None
+    name, args = parts[0], parts[1:]
+    if name not in COMMANDS:
+        raise ValueError(f"unknown command '{name}'")
+    if name in ("way", "remove-way", "export", "snapshot"):
+        if len(args) != 1:
+            raise ValueError(f"'{name}' takes exactly one argument")
+        return name, args
+    if name == "manual":
+        if len(args) not in (1, 2) or (len(args) == 2 and args[1] != "replace"):
+            raise ValueError("usage: manual ROOM [replace]")
+        return name, [int(args[0]), len(args) == 2]
+    if name == "track":
+        if len(args) not in (2, 3):
+            raise ValueError("usage: track WAY VALUE [HI]")
+        return name, [args[0]] + [int(arg) for arg in args[1:]]
+    values = list(map(int, args))
+    if values and min(values) < 0:
+        raise ValueError("values cannot be negative")
+    if name in ("initial", "search", "delete") and len(values) != 1:
+        raise ValueError(f"'{name}' takes exactly one number")
+    if name == "range" and len(values) != 2:
+        raise ValueError("usage: range LO HI")
+    if name == "count" and values:
+        raise ValueError("'count' takes no arguments")
+    return name, values
+
+
+def per_way_arrivals(counts):
+    for way, count in enumerate(counts):
+        for guest_num in range(1, count + 1):
+            values = [0] * len(counts)
+            values[way] = guest_num
+            yield values
+
+
+# Runs every command against hotel and returns a summary of how many of
+# each ran, how many failed and the total time. Consecutive guest lines go
+# through one bulk arrival. Query results are written to out when given.
+def run_commands(hotel, lines, out=None):
+    summary = {"commands": {}, "errors": 0}
+    pending = []
+
+    def flush_guests():
+        if pending:
+            hotel.add_rooms_bulk(pending)
+            pending.clear()
+
+    start = time.perf_counter()
+    for line_num, line in enumerate(lines, 1):
+        try:
+            command = parse_command(line)
+        except ValueError as e:
+            print(f"Error on line {line_num}: {e}")
+            summary["errors"] += 1
+            continue
+        if command is None:
+            continue
+        name, args = command
+        summary["commands"][name] = summary["commands"].get(name, 0) + 1
+
+        if name == "guest":
+            if len(args) != len(hotel.dimensions):
+                print(f"Error on line {line_num}: expected {len(hotel.dimensions)} way values")
+                summary["errors"] += 1
+                continue
+            pending.append(args)
+            continue
+        flush_guests()
+
+        if not execute(hotel, name, args, out):
+            print(f"Error on line {line_num}: '{line.strip()}' failed")
+            summary["errors"] += 1
+    flush_guests()
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def execute(hotel, name, args, out):
+    if name == "way":
+        return hotel.add_dimension(args[0]) >= 0
+    if name == "remove-way":
+        return hotel.remove_dimension(args[0])
+    if name in ("initial", "add", "nested-add") and not hotel.dimensions:
+        return False
+    if name == "initial":
+        hotel.add_rooms_bulk(initial_matrix(args[0], len(hotel.dimensions)), is_initial=True)
+    elif name in ("add", "nested-add"):
+        if len(args) != len(hotel.dimensions):
+            return False
+        hotel.mark_all_guests_as_old()
+        if name == "add":
+            hotel.add_rooms_bulk(per_way_arrivals(args))
+        else:
+            hotel.add_rooms_nested(args)
+    elif name == "manual":
+        return hotel.add_manual_room(args[0], replace=args[1])
+    elif name == "search":
+        details = hotel.search(args[0])
+        if out is not None:
+            if details is None:
+                out.write(f"{args[0]} not found\n")
+            else:
+                out.write(f"{args[0]} {hotel.status_of(details)} {dict(details)}\n")
+    elif name == "delete":
+        if hotel.hash.search(args[0]) is None:
+            return False
+        hotel.delete(args[0])
+    elif name == "track":
+        if args[0] not in hotel.dimensions:
+            return False
+        if len(args) == 2:
+            results = hotel.track_by_dimension(args[0], args[1])
+        else:
+            results = hotel.track_range(args[0], args[1], args[2])
+        if out is not None:
+            out.write(" ".join(str(room_num) for room_num, _ in results) + "\n")
+    elif name == "range":
+        if out is not None:
+            out.write(" ".join(map(str, hotel.rooms_between(args[0], args[1]))) + "\n")
+    elif name == "count":
+        if out is not None:
+            out.write(f"{hotel.guest_count()}\n")
+    elif name == "export":
+        return hotel.write_file(args[0])
+    elif name == "snapshot":
+        return hotel.save_snapshot(args[0])
+    return True
+
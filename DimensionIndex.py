@@ -0,0 +1,108 @@
+import bisect
+
+
+class DimensionIndex:
+    # While a VersionClock has readers pinned, rooms added are stamped with
+    # the version they arrived in and rooms removed are kept in retired with
+    # the versions they were present for, so a view can rebuild any pinned
+    # version from the live sets. Emptied values are only dropped by drain().
+    def __init__(self, clock=None):
+        self.rooms = {}
+        self.values = []
+        self.clock = clock
+        self.born = {}
+        self.retired = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value, room_num):
+        rooms = self.rooms.get(value)
+        if rooms is None:
+            rooms = self.rooms[value] = set()
+            bisect.insort(self.values, value)
+        if self.clock is not None and self.clock.readers:
+            self.born[room_num] = self.clock.version
+        rooms.add(room_num)
+
+    def add_many(self, value, room_nums):
+        rooms = self.rooms.get(value)
+        if rooms is None:
+            rooms = self.rooms[value] = set()
+            bisect.insort(self.values, value)
+        if self.clock is not None and self.clock.readers:
+            room_nums = list(room_nums)
+            self.born.update(dict.fromkeys(room_nums, self.clock.version))
+        rooms.update(room_nums)
+
+    def discard(self, value, room_num):
+        rooms = self.rooms.get(value)
+        if rooms is None or room_num not in rooms:
+            return
+        if self.clock is not None and self.clock.readers:
+            self.retired.setdefault(value, {}).setdefault(room_num, []).append(
+                (self.born.get(room_num), self.clock.version))
+            rooms.discard(room_num)
+            return
+        rooms.discard(room_num)
+        if not rooms:
+            del self.rooms[value]
+            del self.values[bisect.bisect_left(self.values, value)]
+
+    def drain(self):
+        self.born = {}
+        self.retired = {}
+        empty = [value for value, rooms in self.rooms.items() if not rooms]
+        for value in empty:
+            del self.rooms[value]
+        if empty:
+            self.values = sorted(self.rooms)
+
+    def view(self, version):
+        return IndexView(self, version)
+
+    def lookup(self, value):
+        return self.rooms.get(value, set())
+
+    def between(self, lo, hi):
+        start = bisect.bisect_left(self.values, lo)
+        end = bisect.bisect_right(self.values, hi)
+        result = set()
+        for value in self.values[start:end]:
+            result |= self.rooms[value]
+        return result
+
+    def estimate(self, lo, hi):
+        start = bisect.bisect_left(self.values, lo)
+        end = bisect.bisect_right(self.values, hi)
+        return sum(len(self.rooms[value]) for value in self.values[start:end])
+
+
+# The rooms of index as they were at version. Live sets and dicts are
+# copied in one C-level step before they are filtered, so a writer on
+# another thread can keep changing them.
+class IndexView:
+    def __init__(self, index, version):
+        self.index = index
+        self.version = version
+
+    def lookup(self, value):
+        index, version = self.index, self.version
+        rooms = set(index.rooms.get(value, ()))
+        born = index.born
+        if born:
+            rooms = {room_num for room_num in rooms if born.get(room_num, version) <= version}
+        retired = index.retired.get(value)
+        if retired:
+            for room_num, spans in dict(retired).items():
+                for added, removed in spans:
+                    if removed > version and (added is None or added <= version):
+                        rooms.add(room_num)
+        return rooms
+
+    def between(self, lo, hi):
+        values = list(self.index.values)
+        result = set()
+        for value in values[bisect.bisect_left(values, lo):bisect.bisect_right(values, hi)]:
+            result |= self.lookup(value)
+        return result
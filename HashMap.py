@@ -1,9 +1,133 @@
+from array import array
+from functools import partial
+import math
+import random
+
+from Primes import PRIMES
+from Versions import read_version
+
+MIX = 0x9E3779B97F4A7C15
+STRIDE_MIX = 0xC2B2AE3D27D4EB4F
+MASK64 = 0xFFFFFFFFFFFFFFFF
+# Capping the probes per lookup at 4 costs at most about 1.4% false
+# positives against a 1% target, for half the counter reads of the optimum.
+MAX_BLOOM_HASHES = 4
+
+
+# Computes the value a table's *_prehashed methods expect for each key, so
+# worker processes can do the expensive reduction of big room numbers.
+def prehash(spec, keys):
+    if spec[0] == "mod":
+        size = spec[1]
+        return [key % size for key in keys]
+    return [(hash(key) * MIX) & MASK64 for key in keys]
+
+
+# Mixes the low and high 64 bits and the bit length of a key. Unlike
+# hash() or key % size this costs the same for a 10,000-bit room number as
+# for a small one; keys that only differ in their middle bits collide,
+# which only costs the filter a false positive.
+def fingerprint(key):
+    n = key.bit_length()
+    if n > 64:
+        key = (key & MASK64) ^ (key >> (n - 64)) ^ n
+    return (key * MIX) & MASK64
+
+
+# A counting Bloom filter over key fingerprints, sized for expected keys at
+# false_positive_rate. Byte counters let keys be removed again; a counter
+# that reaches 255 stays there, so it can never cause a false negative.
+# The tables that own a filter count what it rejects and every key it let
+# through that they did not hold, which gives the measured false-positive
+# rate; those counts outlive the filter, which is rebuilt on every resize.
+class CountingBloomFilter:
+    def __init__(self, expected, false_positive_rate=0.01):
+        expected = max(expected, 1)
+        bits = -expected * math.log(false_positive_rate) / (math.log(2) ** 2)
+        size = 64
+        while size < bits:
+            size <<= 1
+        self.counters = bytearray(size)
+        self.mask = size - 1
+        self.shift = 64 - (size.bit_length() - 1)
+        self.hashes = min(MAX_BLOOM_HASHES, max(1, round(size / expected * math.log(2))))
+        self.expected = expected
+        self.target_rate = false_positive_rate
+
+    # Double hashing: the top bits of the fingerprint pick the first counter,
+    # as in OpenHashTable, since the low bits keep a key's trailing zeros
+    # and prime-power room numbers are mostly even. A second multiply gives
+    # the odd stride for the rest.
+    def add(self, key):
+        h = fingerprint(key)
+        counters, mask, step = self.counters, self.mask, (((h * STRIDE_MIX) & MASK64) >> self.shift) | 1
+        i = h >> self.shift
+        for _ in range(self.hashes):
+            if counters[i] < 255:
+                counters[i] += 1
+            i = (i + step) & mask
+
+    def discard(self, key):
+        h = fingerprint(key)
+        counters, mask, step = self.counters, self.mask, (((h * STRIDE_MIX) & MASK64) >> self.shift) | 1
+        i = h >> self.shift
+        for _ in range(self.hashes):
+            if counters[i] < 255:
+                counters[i] -= 1
+            i = (i + step) & mask
+
+    # Inlines fingerprint() and exits on the first empty counter; this is
+    # the hot path of every filtered lookup.
+    def might_contain(self, key):
+        n = key.bit_length()
+        if n > 64:
+            key = (key & MASK64) ^ (key >> (n - 64)) ^ n
+        h = (key * MIX) & MASK64
+        counters, shift = self.counters, self.shift
+        i = h >> shift
+        if not counters[i]:
+            return False
+        mask, step = self.mask, (((h * STRIDE_MIX) & MASK64) >> shift) | 1
+        for _ in range(self.hashes - 1):
+            i = (i + step) & mask
+            if not counters[i]:
+                return False
+        return True
+
+    def stats(self):
+        return {"counters": len(self.counters), "hashes": self.hashes, "expected": self.expected}
+
+
+def false_positive_rate(rejected, false_positives):
+    misses = rejected + false_positives
+    return false_positives / misses if misses else 0.0
+
+
 class HashTable:
-    def __init__(self, size: int = 101):
+    def __init__(self, size: int = 101, incremental: bool = False, bloom: bool = False):
         self.count = 0         
         self.load_factor = 0.7
         self.size = size
-        self.table = [[] for _ in range(self.size)]
+        # Empty buckets are None; a list is only allocated on first insert.
+        self.table = [None] * self.size
+        self.incremental = incremental
+        self.rehash_step = 4
+        self.old_table = None
+        self.old_size = 0
+        self.rehash_index = 0
+        # The filter is sized for the keys the table holds before its next
+        # resize and rebuilt with it. While an incremental rehash runs the
+        # old table keeps its own filter.
+        self.use_bloom = bloom
+        self.bloom = self.new_bloom(size) if bloom else None
+        self.old_bloom = None
+        self.bloom_rejected = 0
+        self.bloom_false_positives = 0
+        # With a VersionClock attached, a bucket still visible to a pinned
+        # reader is copied before it is changed and the original is kept in
+        # history, per slot, until no reader needs it.
+        self.clock = None
+        self.history = {}
 
     def __str__(self):
         lines = []
@@ -12,63 +136,489 @@ class HashTable:
                 filtered_bucket = [(room_num, details) for room_num, details in bucket if details is not None]
                 if filtered_bucket:
                     lines.append(f"Bucket {i}: {filtered_bucket}")
+        if self.old_table is not None:
+            for i, bucket in enumerate(self.old_table):
+                if bucket:
+                    filtered_bucket = [(room_num, details) for room_num, details in bucket if details is not None]
+                    if filtered_bucket:
+                        lines.append(f"Old bucket {i}: {filtered_bucket}")
         return "\n".join(lines)
 
     def hash_key(self, key) -> int:
         return key % self.size
+
+    def items(self):
+        for bucket in self.table:
+            if bucket:
+                for k, v in bucket:
+                    yield k, v
+        if self.old_table is not None:
+            for bucket in self.old_table:
+                if bucket:
+                    for k, v in bucket:
+                        yield k, v
     
+    def new_bloom(self, size):
+        return CountingBloomFilter(int(size * self.load_factor) + 1)
+
+    def bloom_stats(self):
+        if self.bloom is None:
+            return None
+        return dict(self.bloom.stats(),
+                    false_positive_rate=false_positive_rate(self.bloom_rejected, self.bloom_false_positives))
+
+    def bloom_counts(self):
+        if not self.use_bloom:
+            return None
+        return {"rejected": self.bloom_rejected, "false_positives": self.bloom_false_positives}
+
+    def _shield(self, index):
+        if self.clock.save(self.history, index, self.table[index]):
+            bucket = self.table[index]
+            self.table[index] = list(bucket) if bucket else None
+
+    def view(self, version):
+        return TableView(self.table, self.history, self.size, version)
+
+    def drain(self):
+        self.history = {}
+
     def is_prime(self,n):
-        if n < 2:
-            return False
-        if n % 2 == 0 and n > 2:
-            return False
-        for i in range(3, int(n**0.5)+1, 2):
-            if n % i == 0:
-                return False
-        return True
+        return PRIMES.is_prime(n)
 
     def next_prime(self,n):
-        while not self.is_prime(n):
-            n += 1
-        return n
+        return PRIMES.next_prime(n)
     
     def resize(self):
-        new_size = self.next_prime(self.size * 2) 
-        new_table = [[] for _ in range(new_size)]
+        new_size = PRIMES.capacity_at_least(self.size * 2)
+        # Migrating in place would change buckets a reader still sees.
+        if self.incremental and not (self.clock is not None and self.clock.readers):
+            self.start_rehash(new_size)
+        else:
+            self.rehash(new_size)
+
+    def reserve(self, extra):
+        needed = self.count + extra
+        if needed / self.size > self.load_factor:
+            self.rehash(PRIMES.capacity_at_least(int(needed / self.load_factor) + 1))
+
+    def rehash(self, new_size):
+        self.finish_rehash()
+        new_table = [None] * new_size
+        bloom = self.new_bloom(new_size) if self.use_bloom else None
         for bucket in self.table:
-            for k, v in bucket:
-                new_index = k % new_size
-                new_table[new_index].append((k, v))
+            if bucket:
+                for k, v in bucket:
+                    if bloom is not None:
+                        bloom.add(k)
+                    new_index = k % new_size
+                    new_bucket = new_table[new_index]
+                    if new_bucket is None:
+                        new_table[new_index] = [(k, v)]
+                    else:
+                        new_bucket.append((k, v))
         self.size = new_size
         self.table = new_table
+        self.history = {}
+        self.bloom = bloom
+
+    # Incremental mode keeps the old table around and migrates a few buckets
+    # per operation instead of rehashing everything inside one insert.
+    def start_rehash(self, new_size):
+        self.finish_rehash()
+        self.old_table = self.table
+        self.old_size = self.size
+        self.rehash_index = 0
+        self.size = new_size
+        self.table = [None] * new_size
+        if self.use_bloom:
+            self.old_bloom = self.bloom
+            self.bloom = self.new_bloom(new_size)
+
+    def rehash_some(self, n):
+        old_table, table, size, bloom = self.old_table, self.table, self.size, self.bloom
+        empty_visits = n * 10
+        while n > 0 and self.rehash_index < self.old_size:
+            bucket = old_table[self.rehash_index]
+            if bucket:
+                for k, v in bucket:
+                    if bloom is not None:
+                        bloom.add(k)
+                    new_index = k % size
+                    new_bucket = table[new_index]
+                    if new_bucket is None:
+                        table[new_index] = [(k, v)]
+                    else:
+                        new_bucket.append((k, v))
+                old_table[self.rehash_index] = None
+                n -= 1
+            else:
+                empty_visits -= 1
+                if empty_visits == 0:
+                    break
+            self.rehash_index += 1
+        if self.rehash_index >= self.old_size:
+            self.old_table = None
+            self.old_bloom = None
+            self.old_size = 0
+            self.rehash_index = 0
+
+    def finish_rehash(self):
+        while self.old_table is not None:
+            self.rehash_some(self.old_size)
 
     def insert(self, key, value):
-        if (self.count + 1) / self.size > self.load_factor:
+        if self.old_table is not None:
+            self.rehash_some(self.rehash_step)
+        elif (self.count + 1) / self.size > self.load_factor:
             self.resize()
+        replaced = False
+        if self.old_table is not None:
+            old_bucket = self.old_table[key % self.old_size]
+            if old_bucket:
+                for i, (k, v) in enumerate(old_bucket):
+                    if k == key:
+                        del old_bucket[i]
+                        if self.old_bloom is not None:
+                            self.old_bloom.discard(key)
+                        replaced = True
+                        break
         bucket_index = self.hash_key(key)
+        if self.clock is not None and self.clock.readers:
+            self._shield(bucket_index)
         bucket = self.table[bucket_index]
+        if bucket is None:
+            bucket = self.table[bucket_index] = []
+        for i, (k, v) in enumerate(bucket):
+            if k == key:
+                bucket[i] = (key, value)
+                return
+        bucket.append((key, value))
+        if self.bloom is not None:
+            self.bloom.add(key)
+        if not replaced:
+            self.count += 1 
+
+    def prehash_spec(self):
+        return ("mod", self.size)
+
+    # Estimates chain lengths from a random sample of buckets.
+    def occupancy(self, sample_size=1000):
+        indexes = random.sample(range(self.size), min(sample_size, self.size))
+        lengths = [len(self.table[i]) if self.table[i] else 0 for i in indexes]
+        chains = [length for length in lengths if length]
+        return {
+            "load_factor": self.count / self.size,
+            "nonempty_fraction": len(chains) / len(lengths),
+            "mean_chain": sum(chains) / len(chains) if chains else 0,
+            "max_chain": max(lengths, default=0),
+        }
+
+    def search_prehashed(self, key, index):
+        if self.old_table is not None:
+            return self.search(key)
+        bloom = self.bloom
+        if bloom is not None and not bloom.might_contain(key) and (
+                self.old_bloom is None or not self.old_bloom.might_contain(key)):
+            self.bloom_rejected += 1
+            return None
+        bucket = self.table[index]
+        if bucket:
+            for k, v in bucket:
+                if key == k:
+                    return v
+        if self.bloom is not None:
+            self.bloom_false_positives += 1
+        return None
+
+    def insert_prehashed(self, key, value, index):
+        if self.old_table is not None or (self.count + 1) / self.size > self.load_factor:
+            return self.insert(key, value)
+        if self.clock is not None and self.clock.readers:
+            self._shield(index)
+        bucket = self.table[index]
+        if bucket is None:
+            bucket = self.table[index] = []
         for i, (k, v) in enumerate(bucket):
             if k == key:
                 bucket[i] = (key, value)
                 return
         bucket.append((key, value))
-        self.count += 1 
+        if self.bloom is not None:
+            self.bloom.add(key)
+        self.count += 1
 
     def search(self, key):
+        if self.old_table is not None:
+            self.rehash_some(self.rehash_step)
+        bloom = self.bloom
+        if bloom is not None and not bloom.might_contain(key) and (
+                self.old_bloom is None or not self.old_bloom.might_contain(key)):
+            self.bloom_rejected += 1
+            return None
         bucket_index = self.hash_key(key)
         bucket = self.table[bucket_index]
-        for k, v in bucket:
-            if key == k:
-                return v
+        if bucket:
+            for k, v in bucket:
+                if key == k:
+                    return v
+        if self.old_table is not None:
+            old_bucket = self.old_table[key % self.old_size]
+            if old_bucket:
+                for k, v in old_bucket:
+                    if key == k:
+                        return v
+        if self.bloom is not None:
+            self.bloom_false_positives += 1
         return None
 
     def remove(self, key):
+        if self.old_table is not None:
+            self.rehash_some(self.rehash_step)
+        bloom = self.bloom
+        if bloom is not None and not bloom.might_contain(key) and (
+                self.old_bloom is None or not self.old_bloom.might_contain(key)):
+            self.bloom_rejected += 1
+            return False
         bucket_index = self.hash_key(key)
         bucket = self.table[bucket_index]
-        for i, kv in enumerate(bucket):
-            k, v = kv
-            if key == k:
-                del bucket[i]
-                self.count -= 1
-                return True
-        return False
\ No newline at end of file
+        if bucket:
+            for i, kv in enumerate(bucket):
+                k, v = kv
+                if key == k:
+                    if self.clock is not None and self.clock.readers:
+                        self._shield(bucket_index)
+                        bucket = self.table[bucket_index]
+                    del bucket[i]
+                    if self.bloom is not None:
+                        self.bloom.discard(key)
+                    self.count -= 1
+                    return True
+        if self.old_table is not None:
+            old_bucket = self.old_table[key % self.old_size]
+            if old_bucket:
+                for i, (k, v) in enumerate(old_bucket):
+                    if key == k:
+                        del old_bucket[i]
+                        if self.old_bloom is not None:
+                            self.old_bloom.discard(key)
+                        self.count -= 1
+                        return True
+        if self.bloom is not None:
+            self.bloom_false_positives += 1
+        return False
+
+
+# A chained table as it was at version. Buckets are never changed once a
+# reader can see them, so lookups need no lock.
+class TableView:
+    def __init__(self, table, history, size, version):
+        self.table = table
+        self.history = history
+        self.size = size
+        self.version = version
+
+    def bucket(self, index):
+        return read_version(self.history, index, self.version, self.table[index])
+
+    def search(self, key):
+        bucket = self.bucket(key % self.size)
+        if bucket:
+            for k, v in bucket:
+                if key == k:
+                    return v
+        return None
+
+    def items(self):
+        for index in range(self.size):
+            bucket = self.bucket(index)
+            if bucket:
+                yield from bucket
+
+
+_EMPTY = object()
+_DELETED = object()
+
+
+class OpenHashTable:
+    def __init__(self, size: int = 128, bloom: bool = False):
+        self.count = 0
+        self.used = 0
+        self.load_factor = 0.7
+        self.use_bloom = bloom
+        self.bloom_rejected = 0
+        self.bloom_false_positives = 0
+        self.allocate(self.capacity_for(size))
+
+    def __str__(self):
+        lines = []
+        for i, k in enumerate(self.keys):
+            if k is not _EMPTY and k is not _DELETED and self.values[i] is not None:
+                lines.append(f"Slot {i}: {(k, self.values[i])}")
+        return "\n".join(lines)
+
+    def capacity_for(self, n):
+        size = 8
+        while size < n:
+            size <<= 1
+        return size
+
+    def allocate(self, size):
+        self.size = size
+        self.mask = size - 1
+        self.shift = 64 - (size.bit_length() - 1)
+        self.keys = [_EMPTY] * size
+        self.values = [None] * size
+        self.hashes = array('Q', bytes(8 * size))
+        self.bloom = CountingBloomFilter(int(size * self.load_factor) + 1) if self.use_bloom else None
+
+    def bloom_stats(self):
+        if self.bloom is None:
+            return None
+        return dict(self.bloom.stats(),
+                    false_positive_rate=false_positive_rate(self.bloom_rejected, self.bloom_false_positives))
+
+    def bloom_counts(self):
+        if not self.use_bloom:
+            return None
+        return {"rejected": self.bloom_rejected, "false_positives": self.bloom_false_positives}
+
+    def hash_key(self, key) -> int:
+        return (hash(key) * MIX) & MASK64
+
+    def items(self):
+        for i, k in enumerate(self.keys):
+            if k is not _EMPTY and k is not _DELETED:
+                yield k, self.values[i]
+
+    def resize(self):
+        if self.count * 2 < self.size * self.load_factor:
+            self.rehash(self.size)
+        else:
+            self.rehash(self.size * 2)
+
+    def reserve(self, extra):
+        needed = self.count + extra
+        if needed / self.size > self.load_factor:
+            self.rehash(self.capacity_for(int(needed / self.load_factor) + 1))
+
+    def rehash(self, new_size):
+        old_keys, old_values, old_hashes = self.keys, self.values, self.hashes
+        self.allocate(new_size)
+        keys, values, hashes, bloom = self.keys, self.values, self.hashes, self.bloom
+        mask, shift = self.mask, self.shift
+        for i, k in enumerate(old_keys):
+            if k is _EMPTY or k is _DELETED:
+                continue
+            if bloom is not None:
+                bloom.add(k)
+            h = old_hashes[i]
+            j = h >> shift
+            while keys[j] is not _EMPTY:
+                j = (j + 1) & mask
+            keys[j] = k
+            values[j] = old_values[i]
+            hashes[j] = h
+        self.used = self.count
+
+    def find(self, key, h):
+        keys, hashes, mask = self.keys, self.hashes, self.mask
+        i = h >> self.shift
+        while True:
+            k = keys[i]
+            if k is _EMPTY:
+                return -1
+            if k is not _DELETED and hashes[i] == h and k == key:
+                return i
+            i = (i + 1) & mask
+
+    def prehash_spec(self):
+        return ("mix",)
+
+    # Estimates probe distances from a random sample of slots.
+    def occupancy(self, sample_size=1000):
+        keys, hashes, mask, shift = self.keys, self.hashes, self.mask, self.shift
+        distances = [(i - (hashes[i] >> shift)) & mask
+                     for i in random.sample(range(self.size), min(sample_size, self.size))
+                     if keys[i] is not _EMPTY and keys[i] is not _DELETED]
+        return {
+            "load_factor": self.count / self.size,
+            "tombstone_fraction": (self.used - self.count) / self.size,
+            "mean_probe": sum(distances) / len(distances) if distances else 0,
+            "max_probe": max(distances, default=0),
+        }
+
+    def insert(self, key, value):
+        self.insert_prehashed(key, value, self.hash_key(key))
+
+    def insert_prehashed(self, key, value, h):
+        if (self.used + 1) / self.size > self.load_factor:
+            self.resize()
+        keys, hashes, mask = self.keys, self.hashes, self.mask
+        i = h >> self.shift
+        tombstone = -1
+        while True:
+            k = keys[i]
+            if k is _EMPTY:
+                break
+            if k is _DELETED:
+                if tombstone < 0:
+                    tombstone = i
+            elif hashes[i] == h and k == key:
+                self.values[i] = value
+                return
+            i = (i + 1) & mask
+        if tombstone >= 0:
+            i = tombstone
+        else:
+            self.used += 1
+        keys[i] = key
+        self.values[i] = value
+        hashes[i] = h
+        if self.bloom is not None:
+            self.bloom.add(key)
+        self.count += 1
+
+    def search_prehashed(self, key, h):
+        i = self.find(key, h)
+        if i < 0:
+            return None
+        return self.values[i]
+
+    # The filter check comes before hash_key, which is the expensive part
+    # for big room numbers.
+    def search(self, key):
+        bloom = self.bloom
+        if bloom is not None:
+            if not bloom.might_contain(key):
+                self.bloom_rejected += 1
+                return None
+            i = self.find(key, self.hash_key(key))
+            if i < 0:
+                self.bloom_false_positives += 1
+                return None
+            return self.values[i]
+        return self.search_prehashed(key, self.hash_key(key))
+
+    def remove(self, key):
+        if self.bloom is not None and not self.bloom.might_contain(key):
+            self.bloom_rejected += 1
+            return False
+        i = self.find(key, self.hash_key(key))
+        if i < 0:
+            if self.bloom is not None:
+                self.bloom_false_positives += 1
+            return False
+        self.keys[i] = _DELETED
+        self.values[i] = None
+        if self.bloom is not None:
+            self.bloom.discard(key)
+        self.count -= 1
+        return True
+
+
+TABLE_TYPES = {
+    "chained": HashTable,
+    "incremental": partial(HashTable, incremental=True),
+    "open": OpenHashTable,
+}
@@ -0,0 +1,883 @@
+from Treap import TREAP_TYPES
+from HashMap import TABLE_TYPES
+from DimensionIndex import DimensionIndex
+from RoomStore import STORE_TYPES, INITIAL, MANUAL
+from Primes import PRIMES
+from Snapshot import ABSENT, read_snapshot, write_snapshot
+import Journal
+from Metrics import Metrics
+from Versions import VersionClock
+from ParallelArrival import PARALLEL_MIN_GUESTS, parallel_nested_arrival
+from RoomNumber import (ROOM_SCHEMES, prime_power_room_number, gamma_room_number, prime_power_room_numbers,
+                        gamma_room_numbers, as_matrix, nested_matrix)
+from array import array
+import csv
+import functools
+import gzip
+import struct
+import time
+import os
+import random
+
+
+# Records the call's latency in the hotel's metrics when they are enabled
+# and prints it when print_timings is set; otherwise it only adds a check.
+# Timed calls are also where the owning thread republishes gauges.
+def timer(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not self.metrics.enabled and not self.print_timings:
+            return func(self, *args, **kwargs)
+        start = time.perf_counter_ns()
+        result = func(self, *args, **kwargs)
+        elapsed = time.perf_counter_ns() - start
+        if self.metrics.enabled:
+            self.metrics.observe_latency(name, elapsed)
+            self.metrics.tick()
+        if self.print_timings:
+            print(f"\n{name} runtime: {elapsed / 1e9:.6f} sec")
+        return result
+    return wrapper
+
+
+# Writes rows to file_name as CSV under the hotel's header, gzip-compressed
+# when asked or when the name ends in .gz.
+def write_csv(file_name, dimensions, rows, compress=None, chunk_size=10000):
+    if not file_name:
+        print("Error: File name cannot be empty")
+        return False
+
+    if compress is None:
+        compress = file_name.endswith(".gz")
+    try:
+        if compress:
+            f = gzip.open(file_name, "wt", newline="")
+        else:
+            f = open(file_name, "w", newline="")
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(["Room Number", "Guest Status"] + dimensions)
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    writer.writerows(chunk)
+                    chunk.clear()
+            writer.writerows(chunk)
+        print(f"Successfully saved to {file_name}")
+        return True
+    except Exception as e:
+        print(f"Error writing file: {e}")
+        return False
+
+
+class Hotel:
+    print_timings = False
+
+    def __init__(self, size = 101, room_scheme = "prime", table = "chained", treap = "node", storage = "dict",
+                 workers = 1, bloom = False):
+        if room_scheme not in ROOM_SCHEMES:
+            raise ValueError(f"Unknown room number scheme '{room_scheme}', expected one of {ROOM_SCHEMES}")
+        if table not in TABLE_TYPES:
+            raise ValueError(f"Unknown hash table type '{table}', expected one of {tuple(TABLE_TYPES)}")
+        if treap not in TREAP_TYPES:
+            raise ValueError(f"Unknown treap type '{treap}', expected one of {tuple(TREAP_TYPES)}")
+        if storage not in STORE_TYPES:
+            raise ValueError(f"Unknown room storage '{storage}', expected one of {tuple(STORE_TYPES)}")
+        self.room_scheme = room_scheme
+        self.table_kind = table
+        self.treap_kind = treap
+        self.storage_kind = storage
+        self.treap = TREAP_TYPES[treap]()
+        self.bloom = bloom
+        self.hash = TABLE_TYPES[table](size, bloom=bloom)
+        self.store = STORE_TYPES[storage]()
+        self.dimensions = []
+        self.indexes = {}
+        self.epoch = 0
+        self.probe_stats = {}
+        self.workers = workers
+        self.journal = None
+        self.journal_generation = 0
+        self.clock = VersionClock()
+        self._attach_clock()
+        self._reset_counters()
+        self.metrics = Metrics()
+        self._register_gauges()
+
+    def is_prime(self, n):
+        return PRIMES.is_prime(n)
+
+    # Returns the shared prime table without copying; only the first n
+    # entries are meant to be read.
+    def generate_primes(self, n):
+        return PRIMES.first(n)
+
+    def calculate_room_number(self, values: list) -> int:
+        if self.room_scheme == "gamma":
+            return gamma_room_number(values)
+        primes = self.generate_primes(len(values))
+        return prime_power_room_number(values, primes)
+
+    def calculate_room_numbers(self, matrix) -> list:
+        if self.room_scheme == "gamma":
+            return gamma_room_numbers(matrix)
+        return prime_power_room_numbers(matrix, self.generate_primes(len(self.dimensions)))
+    
+    def add_room(self, values: list, is_initial=False):
+        target = self.calculate_room_number(values)
+        room_num = target
+        
+        if self.hash.search(room_num) is not None:
+            room_num = self.next_free_room(room_num)
+        self._record_probe(room_num - target)
+        
+        handle = self.store.add(self.dimensions, values, self.epoch, INITIAL if is_initial else 0)
+        
+        self.hash.insert(room_num, handle)
+        self.treap.add(room_num)
+        self._index_room(room_num, handle)
+        if self.journal is not None:
+            self.journal.log_add(room_num, self.epoch, INITIAL if is_initial else 0, list(values))
+
+        return room_num
+
+    def add_rooms_bulk(self, values_list, is_initial=False):
+        matrix = as_matrix(values_list)
+        targets = self.calculate_room_numbers(matrix)
+        rows = matrix.tolist() if hasattr(matrix, 'tolist') else matrix
+        return self._assign_rooms(((values, target, None) for values, target in zip(rows, targets)),
+                                  INITIAL if is_initial else 0)
+
+    def add_rooms_nested(self, counts, workers=None):
+        workers = self.workers if workers is None else workers
+        total = 1
+        for c in counts:
+            total *= c
+        if workers <= 1 or total < PARALLEL_MIN_GUESTS:
+            return self.add_rooms_bulk(nested_matrix(counts))
+
+        self.hash.reserve(total)
+        spec = self.hash.prehash_spec()
+        primes = self.generate_primes(len(counts))[:len(counts)]
+        arrivals = parallel_nested_arrival(counts, self.room_scheme, primes, spec, workers)
+        return self._assign_rooms(arrivals, 0, spec)
+
+    # Works out the room of each guest at its precomputed target without
+    # changing anything; commit_rooms places a prefix of the plan. limits
+    # maps a target to the first room number past its segment: planning
+    # stops at the first guest that would land there and returns it as
+    # (its position, that limit) instead.
+    def plan_rooms(self, rows, targets, limits=None):
+        return self._plan_rooms(((values, target, None) for values, target in zip(rows, targets)), limits)
+
+    def commit_rooms(self, plan, is_initial=False):
+        return self._commit_rooms(plan, INITIAL if is_initial else 0)
+
+    # arrivals yields (values, target room, prehashed slot or None); slots
+    # are only trusted while the table still matches the spec they came from.
+    def _assign_rooms(self, arrivals, flags, spec=None):
+        return self._commit_rooms(self._plan_rooms(arrivals)[0], flags, spec)
+
+    def _plan_rooms(self, arrivals, limits=None):
+        plan = []
+        skip = {}
+        for values, target, slot in arrivals:
+            room_num = target
+
+            if slot is None:
+                taken = self.hash.search(room_num) is not None
+            else:
+                taken = self.hash.search_prehashed(room_num, slot) is not None
+            if room_num in skip or taken:
+                room_num = self._next_free_in_batch(room_num, skip)
+                slot = None
+                if limits is not None:
+                    limit = limits.get(target)
+                    if limit is not None and room_num >= limit:
+                        return plan, (len(plan), limit)
+            skip[room_num] = room_num + 1
+            plan.append((values, target, room_num, slot))
+        return plan, None
+
+    def _commit_rooms(self, plan, flags, spec=None):
+        batch = {}
+        slots = {}
+        for values, target, room_num, slot in plan:
+            if slot is not None:
+                slots[room_num] = slot
+            self._record_probe(room_num - target)
+
+            batch[room_num] = self.store.add(self.dimensions, values, self.epoch, flags)
+            if self.journal is not None:
+                self.journal.log_add(room_num, self.epoch, flags, list(values))
+
+        if not batch:
+            return []
+
+        self.hash.reserve(len(batch))
+        use_slots = spec is not None and self.hash.prehash_spec() == spec
+        for room_num, handle in batch.items():
+            slot = slots.get(room_num) if use_slots else None
+            if slot is None:
+                self.hash.insert(room_num, handle)
+            else:
+                self.hash.insert_prehashed(room_num, handle, slot)
+            self._index_room(room_num, handle)
+
+        room_nums = sorted(batch)
+        if len(room_nums) * 8 < self.hash.count:
+            for room_num in room_nums:
+                self.treap.add(room_num)
+        else:
+            self.treap.add_sorted(room_nums)
+
+        if self.metrics.enabled:
+            self.metrics.tick()
+        return list(batch)
+
+    # skip maps every room taken by the current batch to a candidate after
+    # it; chains are path-compressed so a run is only walked once.
+    def _next_free_in_batch(self, room_num, skip):
+        path = []
+        while True:
+            if room_num in skip:
+                path.append(room_num)
+                room_num = skip[room_num]
+            elif self.hash.search(room_num) is not None:
+                path.append(room_num)
+                room_num = self.next_free_room(room_num)
+            else:
+                break
+        for taken in path:
+            skip[taken] = room_num
+        return room_num
+
+    def _record_probe(self, displacement):
+        if self.metrics.enabled:
+            self.metrics.observe("probe_displacement", displacement)
+        stats = self.probe_stats.get(self.epoch)
+        if stats is None:
+            stats = self.probe_stats[self.epoch] = {
+                'guests': 0, 'collisions': 0, 'total_displacement': 0, 'max_displacement': 0, 'histogram': {},
+            }
+        stats['guests'] += 1
+        if displacement:
+            stats['collisions'] += 1
+            stats['total_displacement'] += displacement
+            stats['max_displacement'] = max(stats['max_displacement'], displacement)
+            bucket = displacement.bit_length() - 1
+            stats['histogram'][bucket] = stats['histogram'].get(bucket, 0) + 1
+
+    def arrival_probe_stats(self, epoch=None):
+        return self.probe_stats.get(self.epoch if epoch is None else epoch)
+
+    def print_probe_stats(self):
+        stats = self.arrival_probe_stats()
+        if not stats:
+            return
+        mean = stats['total_displacement'] / stats['collisions'] if stats['collisions'] else 0
+        print(f"Collisions: {stats['collisions']}/{stats['guests']} guests, "
+              f"mean displacement {mean:.1f}, max displacement {stats['max_displacement']}")
+
+    @timer
+    def search(self, room_num):
+        handle = self.hash.search(room_num)
+        if handle is None:
+            return None
+        return self.store.view(handle)
+    
+    @timer
+    def delete(self, room_num):
+        if self._remove_room(room_num) and self.journal is not None:
+            self.journal.log_delete(room_num)
+
+    def _remove_room(self, room_num):
+        handle = self.hash.search(room_num)
+        if handle is None:
+            return False
+        self._unindex_room(room_num, handle)
+        self.treap.delete_node(room_num)
+        self.hash.remove(room_num)
+        self.store.release(handle)
+        return True
+
+    # Every room that enters or leaves the hotel passes through these two,
+    # so they also keep the guest counters current.
+    def _index_room(self, room_num, handle):
+        if self.clock.stale:
+            self._collect_versions()
+        self._count_room(handle, 1)
+        for dimension_name in self.dimensions:
+            value = self.store.value(handle, dimension_name)
+            if value is not None:
+                self.indexes[dimension_name].add(value, room_num)
+                if value:
+                    self.nonzero_counts[dimension_name] += 1
+
+    def _unindex_room(self, room_num, handle):
+        if self.clock.stale:
+            self._collect_versions()
+        self._count_room(handle, -1)
+        for dimension_name in self.dimensions:
+            value = self.store.value(handle, dimension_name)
+            if value is not None:
+                self.indexes[dimension_name].discard(value, room_num)
+                if value:
+                    self.nonzero_counts[dimension_name] -= 1
+
+    def _count_room(self, handle, delta):
+        self.room_count += delta
+        if self.metrics.enabled:
+            self.metrics.inc("rooms_added" if delta > 0 else "rooms_removed")
+        epoch = self.store.epoch(handle)
+        self.epoch_counts[epoch] = self.epoch_counts.get(epoch, 0) + delta
+        if not self.epoch_counts[epoch]:
+            del self.epoch_counts[epoch]
+        flags = self.store.flags(handle)
+        if flags & INITIAL:
+            self.initial_count += delta
+        if flags & MANUAL:
+            self.manual_count += delta
+
+    def _register_gauges(self):
+        metrics = self.metrics
+        metrics.register_gauge("rooms", lambda: self.room_count)
+        metrics.register_gauge("rooms_new", lambda: self.guest_status_summary()[1])
+        metrics.register_gauge("epoch", lambda: self.epoch)
+        metrics.register_gauge("buckets", lambda: self.hash.occupancy())
+        metrics.register_gauge("treap_depth", self.treap_depth)
+        metrics.register_gauge("bloom", lambda: self.hash.bloom_stats())
+        metrics.register_counter("bloom", lambda: self.hash.bloom_counts())
+        metrics.register_gauge("probe", lambda: {
+            key: value for key, value in (self.arrival_probe_stats() or {}).items()
+            if key in ("collisions", "max_displacement")})
+
+    # Depth of the rooms at sample_size random ranks, as mean and max.
+    def treap_depth(self, sample_size=200):
+        n = len(self.treap)
+        if not n:
+            return {"mean": 0, "max": 0}
+        depths = [self.treap.depth(self.treap.select(random.randrange(n))) for _ in range(min(sample_size, n))]
+        return {"mean": sum(depths) / len(depths), "max": max(depths)}
+
+    def _reset_counters(self):
+        self.room_count = 0
+        self.epoch_counts = {}
+        self.initial_count = 0
+        self.manual_count = 0
+        self.nonzero_counts = {dimension_name: 0 for dimension_name in self.dimensions}
+
+    @timer
+    def write_file(self, file_name: str, compress=None, chunk_size=10000):
+        return write_csv(file_name, self.dimensions, self.export_rows(), compress, chunk_size)
+
+    # CSV rows in room order, starting at the first room >= start.
+    def export_rows(self, start=None):
+        for room_num in self.treap.iter_from(start):
+            handle = self.hash.search(room_num)
+            if handle is None:
+                continue
+            row = [room_num, self.epoch_status(self.store.epoch(handle))]
+            for dimension_name in self.dimensions:
+                value = self.store.value(handle, dimension_name)
+                row.append("" if value is None else value)
+            yield row
+
+    @timer
+    def save_snapshot(self, path: str):
+        keys = self.treap.InOrder()
+        epochs = array('q')
+        flags = bytearray()
+        columns = {dimension_name: array('q') for dimension_name in self.dimensions}
+        for room_num in keys:
+            handle = self.hash.search(room_num)
+            epochs.append(self.store.epoch(handle))
+            flags.append(self.store.flags(handle))
+            for dimension_name in self.dimensions:
+                value = self.store.value(handle, dimension_name)
+                columns[dimension_name].append(ABSENT if value is None else value)
+        try:
+            write_snapshot(path, self.room_scheme, self.epoch, self.dimensions, keys, epochs, flags, columns,
+                           self.journal_generation)
+        except (OSError, OverflowError) as e:
+            print(f"Error writing snapshot: {e}")
+            return False
+        print(f"Successfully saved snapshot of {len(keys)} rooms to {path}")
+        return True
+
+    @timer
+    def load_snapshot(self, path: str):
+        try:
+            state = read_snapshot(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Error loading snapshot: {e}")
+            return False
+
+        # Everything is built aside and only swapped in once the whole file
+        # has been taken in, so a bad snapshot leaves the hotel as it was.
+        keys = state["keys"]
+        dimensions = state["dimensions"]
+        if state["room_scheme"] not in ROOM_SCHEMES:
+            print(f"Error loading snapshot: unknown room number scheme '{state['room_scheme']}'")
+            return False
+        try:
+            treap = TREAP_TYPES[self.treap_kind]()
+            treap.build_from_sorted(keys)
+            table = TABLE_TYPES[self.table_kind](bloom=self.bloom)
+            table.reserve(len(keys))
+            store = STORE_TYPES[self.storage_kind]()
+            handles = store.load_rows(dimensions, state["epochs"], state["flags"], state["columns"], ABSENT)
+            for room_num, handle in zip(keys, handles):
+                table.insert(room_num, handle)
+
+            epoch_counts = {}
+            for epoch in state["epochs"]:
+                epoch_counts[epoch] = epoch_counts.get(epoch, 0) + 1
+            initial_count = sum(1 for room_flags in state["flags"] if room_flags & INITIAL)
+            manual_count = sum(1 for room_flags in state["flags"] if room_flags & MANUAL)
+
+            indexes = {}
+            nonzero_counts = {dimension_name: 0 for dimension_name in dimensions}
+            for dimension_name in dimensions:
+                groups = {}
+                for room_num, value in zip(keys, state["columns"][dimension_name]):
+                    if value != ABSENT:
+                        groups.setdefault(value, []).append(room_num)
+                indexes[dimension_name] = DimensionIndex(self.clock)
+                for value, rooms in groups.items():
+                    indexes[dimension_name].add_many(value, rooms)
+                    if value:
+                        nonzero_counts[dimension_name] += len(rooms)
+        except (IndexError, KeyError, ValueError) as e:
+            print(f"Error loading snapshot: {e}")
+            return False
+
+        self.room_scheme = state["room_scheme"]
+        self.epoch = state["epoch"]
+        self.dimensions = dimensions
+        self.journal_generation = state["generation"]
+        self.probe_stats = {}
+        self.treap = treap
+        self.hash = table
+        self.store = store
+        self.indexes = indexes
+        self._attach_clock()
+
+        self.room_count = len(keys)
+        self.epoch_counts = epoch_counts
+        self.initial_count = initial_count
+        self.manual_count = manual_count
+        self.nonzero_counts = nonzero_counts
+
+        print(f"Successfully loaded {len(keys)} rooms from {path}")
+        return True
+
+    # Replays the journal on top of the current state (normally a freshly
+    # loaded snapshot) and keeps appending to it. A journal from an older
+    # generation was already folded into the snapshot and is discarded; one
+    # from a newer generation needs its snapshot loaded first, and is left as is.
+    def open_journal(self, path: str, fsync_interval=0.05):
+        try:
+            generation, records, valid_end = Journal.read_journal(path)
+        except (OSError, ValueError) as e:
+            print(f"Error opening journal: {e}")
+            return False
+        if generation is not None and generation > self.journal_generation:
+            print(f"Error opening journal: {path} is from generation {generation}, newer than the loaded "
+                  f"snapshot's {self.journal_generation}; load the matching snapshot first")
+            return False
+        if self.journal is not None:
+            self.journal.close()
+
+        if generation is not None and generation < self.journal_generation:
+            records, valid_end = [], 0
+        for op, payload in records:
+            self._replay(op, payload)
+        self.journal = Journal.Journal(path, self.journal_generation, fsync_interval, valid_end=valid_end)
+        print(f"Replayed {len(records)} journal records from {path}")
+        return True
+
+    def _replay(self, op, payload):
+        if op == Journal.ADD:
+            self._put_room(*Journal.decode_add(payload))
+        elif op == Journal.DELETE:
+            self._remove_room(Journal.decode_key(payload))
+        elif op == Journal.ADD_DIMENSION:
+            dimension_name = Journal.decode_text(payload)
+            if dimension_name not in self.dimensions:
+                self._append_dimension(dimension_name)
+        elif op == Journal.REMOVE_DIMENSION:
+            dimension_name = Journal.decode_text(payload)
+            if dimension_name in self.dimensions:
+                self._drop_dimension(dimension_name)
+        elif op == Journal.EPOCH:
+            self.epoch = Journal.decode_epoch(payload)
+
+    # Puts a room at exactly room_num, replacing any occupant; values may
+    # stop short of the way list for an initial room born before later ways.
+    def _put_room(self, room_num, epoch, flags, values):
+        self._remove_room(room_num)
+        handle = self.store.add(self.dimensions, values, epoch, flags)
+        self.hash.insert(room_num, handle)
+        self.treap.add(room_num)
+        self._index_room(room_num, handle)
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    # Folds the journal into a new snapshot. The snapshot carries the next
+    # generation, so a crash before the journal is reset leaves a stale
+    # journal that open_journal skips instead of replaying twice.
+    def compact_journal(self, snapshot_path: str):
+        if self.journal is None:
+            print("Error: No journal is open")
+            return False
+        self.journal.sync()
+        self.journal_generation += 1
+        tmp_path = snapshot_path + ".tmp"
+        if not self.save_snapshot(tmp_path):
+            self.journal_generation -= 1
+            return False
+        # The rename must be on disk before the journal it replaces is emptied.
+        os.replace(tmp_path, snapshot_path)
+        directory = os.open(os.path.dirname(os.path.abspath(snapshot_path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self.journal.reset(self.journal_generation)
+        return True
+
+    def _attach_clock(self):
+        self.hash.clock = self.clock
+        self.store.clock = self.clock
+
+    # Drops what the structures kept for snapshots once the last one has
+    # been released. Runs on the writing thread, ahead of its next change.
+    def _collect_versions(self):
+        with self.clock.lock:
+            if self.clock.readers:
+                return
+            self.clock.stale = False
+        self.hash.drain()
+        self.store.drain()
+        for index in self.indexes.values():
+            index.drain()
+
+    # A consistent, read-only view of the hotel as it is now, taken in O(1)
+    # and safe to read from another thread while this one keeps writing.
+    # Call it from the writing thread and close the view when done.
+    def snapshot(self):
+        import ReadView
+
+        if self.treap_kind != "persistent" or self.table_kind == "open":
+            raise ValueError("Snapshots need treap='persistent' and a chained hash table")
+        self.hash.finish_rehash()
+        return ReadView.ReadView(self)
+
+    @timer
+    def sort(self):
+        return self.treap.inorder()
+
+    @property
+    def max_room_num(self):
+        return self.treap.max() or 0
+
+    def rooms_between(self, lo, hi):
+        return self.treap.range(lo, hi)
+
+    def kth_room(self, k):
+        return self.treap.select(k - 1)
+
+    def rooms_below(self, room_num):
+        return self.treap.rank(room_num)
+
+    def next_room(self, room_num):
+        return self.treap.successor(room_num)
+
+    def previous_room(self, room_num):
+        return self.treap.predecessor(room_num)
+
+    def iter_rooms(self, page_size=100, start=None):
+        return self.treap.pages(page_size, start)
+
+    def next_free_room(self, room_num):
+        if not self.treap.contains(room_num):
+            return room_num
+        # [room_num, room_num + m) is fully occupied exactly when m rooms
+        # rank between its ends, so gallop and then bisect on m.
+        base = self.treap.rank(room_num)
+        step = 1
+        while self.treap.rank(room_num + step) - base == step:
+            step *= 2
+        lo, hi = step // 2, step
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.treap.rank(room_num + mid) - base == mid:
+                lo = mid
+            else:
+                hi = mid
+        return room_num + lo
+    
+    @timer
+    def memory_report(self, sample_size=1000, exact=False):
+        import MemoryReport
+
+        return MemoryReport.memory_report(self, sample_size, exact)
+
+    def memory_usage(self, exact=False):
+        return sum(self.memory_report(exact=exact).values())
+
+    @timer
+    def guest_count(self) -> int:
+        return self.room_count
+    
+    def guest_status_summary(self):
+        new_count = self.epoch_counts.get(self.epoch, 0) if self.epoch > 0 else 0
+        return self.room_count - new_count, new_count
+
+    def guest_counters(self):
+        old_count, new_count = self.guest_status_summary()
+        return {
+            "total": self.room_count, "old": old_count, "new": new_count,
+            "initial": self.initial_count, "manual": self.manual_count,
+            "nonzero": dict(self.nonzero_counts),
+        }
+
+    # Recomputes every counter with a full scan; returns the names of the
+    # counters that disagree with the maintained ones.
+    def check_counters(self):
+        expected = {"total": 0, "old": 0, "new": 0, "initial": 0, "manual": 0,
+                    "nonzero": {dimension_name: 0 for dimension_name in self.dimensions}}
+        for _, handle in self.hash.items():
+            if handle is None:
+                continue
+            expected["total"] += 1
+            expected[self.epoch_status(self.store.epoch(handle))] += 1
+            flags = self.store.flags(handle)
+            if flags & INITIAL:
+                expected["initial"] += 1
+            if flags & MANUAL:
+                expected["manual"] += 1
+            for dimension_name in self.dimensions:
+                if self.store.value(handle, dimension_name):
+                    expected["nonzero"][dimension_name] += 1
+        actual = self.guest_counters()
+        return [name for name in expected if expected[name] != actual[name]]
+    
+    def add_manual_room(self, room_num: int, replace=None):
+        
+        if room_num < 0:
+            print("Error: Room number cannot be negative")
+            return False
+        
+        self.mark_all_guests_as_old()
+            
+        if self.hash.search(room_num) is not None:
+            if replace is None:
+                ans = input(f"Room number {room_num} is already occupied, do you want to replace?\n(1) Yes\n(2) No\nSelect Command : ")
+            else:
+                ans = '1' if replace else '2'
+            if ans == '1':
+                start = time.perf_counter()
+                self._remove_room(room_num)
+                handle = self.store.add(self.dimensions, [], self.epoch, MANUAL)
+                self.hash.insert(room_num, handle)
+                self.treap.add(room_num)
+                self._index_room(room_num, handle)
+                if self.journal is not None:
+                    self.journal.log_add(room_num, self.epoch, MANUAL, [])
+                end = time.perf_counter()
+                elapsed = end - start
+                print(f"Successfully replaced and added manual room {room_num}")
+                if self.print_timings:
+                    print(f"\nadd_manual_room runtime: {elapsed:.6f} sec")
+                return True
+            elif ans == '2':
+                print("Discarded")
+                return False
+            else:
+                print("Invalid Input")
+                return False
+        
+        start = time.perf_counter()
+        handle = self.store.add(self.dimensions, [], self.epoch, MANUAL)
+        self.hash.insert(room_num, handle)
+        self.treap.add(room_num)
+        self._index_room(room_num, handle)
+        if self.journal is not None:
+            self.journal.log_add(room_num, self.epoch, MANUAL, [])
+        end = time.perf_counter()
+        elapsed = end - start
+        print(f"Successfully added manual room {room_num}")
+        if self.print_timings:
+            print(f"\nadd_manual_room runtime: {elapsed:.6f} sec")
+        return True
+    
+    def epoch_status(self, epoch):
+        if self.epoch > 0 and epoch == self.epoch:
+            return 'new'
+        return 'old'
+
+    def status_of(self, details):
+        return self.epoch_status(details.get('epoch', 0))
+
+    def guest_status(self, room_num):
+        handle = self.hash.search(room_num)
+        if handle is None:
+            return None
+        return self.epoch_status(self.store.epoch(handle))
+
+    def mark_all_guests_as_old(self):
+        self.epoch += 1
+        if self.journal is not None:
+            self.journal.log_epoch(self.epoch)
+
+    def prepare_for_new_guests(self):
+        self.mark_all_guests_as_old()
+        print("Hotel ready for new guest arrivals")
+
+    def add_dimension(self, dimension_name: str):
+        if not dimension_name:
+            print("Error: Dimension name cannot be empty")
+            return -1
+        
+        if dimension_name in self.dimensions:
+            print(f"Error: Way '{dimension_name}' already exists")
+            return -1
+        
+        self._append_dimension(dimension_name)
+        if self.journal is not None:
+            self.journal.log_add_dimension(dimension_name)
+        return len(self.dimensions) - 1
+
+    def _append_dimension(self, dimension_name):
+        self.dimensions.append(dimension_name)
+        self.store.add_column(dimension_name, (handle for _, handle in self.hash.items()))
+        zero_rooms = [room_num for room_num, handle in self.hash.items()
+                      if handle is not None and self.store.value(handle, dimension_name) == 0]
+        self.indexes[dimension_name] = DimensionIndex(self.clock)
+        self.nonzero_counts[dimension_name] = 0
+        if zero_rooms:
+            self.indexes[dimension_name].add_many(0, zero_rooms)
+
+    def remove_dimension(self, dimension_name: str):
+        if dimension_name not in self.dimensions:
+            print(f"Error: Way '{dimension_name}' does not exist")
+            return False
+        
+        if len(self.dimensions) <= 1:
+            print("Error: Cannot remove the last arrival way. At least one way must remain.")
+            return False
+        
+        self._drop_dimension(dimension_name)
+        if self.journal is not None:
+            self.journal.log_remove_dimension(dimension_name)
+        
+        print(f"Successfully removed way '{dimension_name}'")
+        print(f"Remaining ways: {self.dimensions}")
+        return True
+
+    def _drop_dimension(self, dimension_name):
+        self.dimensions.remove(dimension_name)
+        del self.indexes[dimension_name]
+        del self.nonzero_counts[dimension_name]
+        if self.clock.readers:
+            for room_num, handle in self.store.drop_column_shared(dimension_name, list(self.hash.items())):
+                self.hash.insert(room_num, handle)
+        else:
+            self.store.drop_column(dimension_name, (handle for _, handle in self.hash.items()))
+
+    @timer
+    def track_by_dimension(self, dimension_name: str, value: int) -> list:
+        if dimension_name not in self.dimensions:
+            return []
+        
+        rooms = self.indexes[dimension_name].lookup(value)
+        return [(room_num, self.store.view(self.hash.search(room_num))) for room_num in sorted(rooms)]
+
+    def track_range(self, dimension_name: str, lo: int, hi: int) -> list:
+        if dimension_name not in self.dimensions:
+            return []
+
+        rooms = self.indexes[dimension_name].between(lo, hi)
+        return [(room_num, self.store.view(self.hash.search(room_num))) for room_num in sorted(rooms)]
+
+    def track_where(self, conditions: dict) -> list:
+        # Each condition is either an exact value or an inclusive (lo, hi)
+        # pair; the smallest candidate set is intersected with the others.
+        if not conditions or any(name not in self.dimensions for name in conditions):
+            return []
+
+        def bounds(condition):
+            if isinstance(condition, tuple):
+                return condition
+            return condition, condition
+
+        order = sorted(conditions, key=lambda name: self.indexes[name].estimate(*bounds(conditions[name])))
+        rooms = None
+        for dimension_name in order:
+            lo, hi = bounds(conditions[dimension_name])
+            if lo == hi:
+                matches = self.indexes[dimension_name].lookup(lo)
+            else:
+                matches = self.indexes[dimension_name].between(lo, hi)
+            rooms = set(matches) if rooms is None else rooms & matches
+            if not rooms:
+                return []
+        return [(room_num, self.store.view(self.hash.search(room_num))) for room_num in sorted(rooms)]
+
+    def add_guests_nested(self):
+        print("\n=== Add Guests with Nested Ways ===")
+        print("Each way contains the next way\n")
+        
+        try:
+            counts = []
+            for i, way in enumerate(self.dimensions):
+                if i == 0:
+                    count = int(input(f"How many {way}? "))
+                else:
+                    count = int(input(f"How many {way} per {self.dimensions[i-1]}? "))
+                
+                if count < 0:
+                    print(f"Error: Cannot have negative {way}")
+                    return False
+                counts.append(count)
+            
+            total = 1
+            for c in counts:
+                if c > 0:
+                    total *= c
+            
+            if total == 0:
+                print("Error: Total guests would be 0")
+                return False
+            
+            print(f"\nTotal guests to add: {total}")
+            print(f"Calculation: {' × '.join(map(str, counts))} = {total}")
+            
+            confirm = input("Confirm? (y/n): ")
+            if confirm.lower() != 'y':
+                print("Cancelled")
+                return False
+            
+            self.mark_all_guests_as_old()
+            
+            start = time.perf_counter()
+            self.add_rooms_nested(counts)
+            
+            end = time.perf_counter()
+            elapsed = end - start
+            
+            print(f"Successfully added {total} guests")
+            print(f"\nadd_guests_nested runtime: {elapsed:.6f} sec")
+            self.print_probe_stats()
+            return True
+        except ValueError:
+            print("Error: Invalid input. Please enter valid numbers.")
+            return False
@@ -0,0 +1,155 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = b"HHWAL\0\0\1"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<BII")
+ADD_HEADER = struct.Struct("<qBH")
+LENGTH = struct.Struct("<H")
+EPOCH_VALUE = struct.Struct("<q")
+
+ADD = 1
+DELETE = 2
+ADD_DIMENSION = 3
+REMOVE_DIMENSION = 4
+EPOCH = 5
+
+
+def _encode_key(key):
+    data = key.to_bytes((key.bit_length() + 7) // 8 or 1, "little")
+    return LENGTH.pack(len(data)) + data
+
+
+def _decode_key(payload, offset=0):
+    (length,) = LENGTH.unpack_from(payload, offset)
+    offset += LENGTH.size
+    return int.from_bytes(payload[offset:offset + length], "little"), offset + length
+
+
+def decode_add(payload):
+    key, offset = _decode_key(payload)
+    epoch, flags, n = ADD_HEADER.unpack_from(payload, offset)
+    offset += ADD_HEADER.size
+    values = list(struct.unpack_from(f"<{n}q", payload, offset))
+    return key, epoch, flags, values
+
+
+def decode_key(payload):
+    return _decode_key(payload)[0]
+
+
+def decode_text(payload):
+    return payload.decode("utf-8")
+
+
+def decode_epoch(payload):
+    return EPOCH_VALUE.unpack(payload)[0]
+
+
+# Returns the journal's generation, every intact record and the byte offset
+# just past the last one; a torn or corrupt tail from a crash mid-write is
+# ignored. The generation ties the journal to the snapshot it extends.
+def read_journal(path):
+    records = []
+    if not os.path.exists(path):
+        return None, records, 0
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size or not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a hotel journal")
+    generation = HEADER.unpack_from(data, 0)[1]
+    offset = HEADER.size
+    while offset + RECORD.size <= len(data):
+        op, length, crc = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append((op, payload))
+        offset = start + length
+    return generation, records, offset
+
+
+# Records are buffered and written with one fsync per group commit: when
+# fsync_interval has passed, the buffer outgrows buffer_limit, or on
+# sync()/close(). An interval of 0 fsyncs every record.
+class Journal:
+    def __init__(self, path, generation=0, fsync_interval=0.05, buffer_limit=1 << 20, valid_end=None):
+        self.path = path
+        self.generation = generation
+        self.fsync_interval = fsync_interval
+        self.buffer_limit = buffer_limit
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+        self.file = open(path, "ab+")
+        if valid_end is not None and valid_end < self.file.seek(0, os.SEEK_END):
+            self.file.truncate(valid_end)
+        if self.file.seek(0, os.SEEK_END) == 0:
+            self.file.write(HEADER.pack(MAGIC, generation))
+            self._fsync()
+        self.last_sync = time.monotonic()
+        self.closed = threading.Event()
+        self.flusher = None
+        if fsync_interval > 0:
+            self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def _fsync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.fsync_interval):
+            if self.buffer:
+                self.sync()
+
+    def append(self, op, payload):
+        with self.lock:
+            self.buffer += RECORD.pack(op, len(payload), zlib.crc32(payload))
+            self.buffer += payload
+            due = (len(self.buffer) >= self.buffer_limit
+                   or time.monotonic() - self.last_sync >= self.fsync_interval)
+        if due:
+            self.sync()
+
+    def sync(self):
+        with self.lock:
+            if self.buffer:
+                self.file.write(self.buffer)
+                self.buffer.clear()
+                self._fsync()
+            self.last_sync = time.monotonic()
+
+    def reset(self, generation):
+        with self.lock:
+            self.buffer.clear()
+            self.file.truncate(0)
+            self.file.write(HEADER.pack(MAGIC, generation))
+            self._fsync()
+            self.generation = generation
+
+    def close(self):
+        self.closed.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.sync()
+        self.file.close()
+
+    def log_add(self, key, epoch, flags, values):
+        self.append(ADD, _encode_key(key) + ADD_HEADER.pack(epoch, flags, len(values))
+                    + struct.pack(f"<{len(values)}q", *values))
+
+    def log_delete(self, key):
+        self.append(DELETE, _encode_key(key))
+
+    def log_add_dimension(self, name):
+        self.append(ADD_DIMENSION, name.encode("utf-8"))
+
+    def log_remove_dimension(self, name):
+        self.append(REMOVE_DIMENSION, name.encode("utf-8"))
+
+    def log_epoch(self, epoch):
+        self.append(EPOCH, EPOCH_VALUE.pack(epoch))
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+
+
+# Each connection keeps up to depth requests in flight and times every
+# request from send to response. Guests are added with random way values;
+# reads search rooms this connection was given or scan a room range.
+async def run_connection(connect, n_requests, depth, write_ratio, ways, max_value, seed, latencies, stats):
+    reader, writer = await connect()
+    rng = random.Random(seed)
+    rooms = []
+    sent = deque()
+    slots = asyncio.Semaphore(depth)
+
+    async def receive():
+        for _ in range(n_requests):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("server closed the connection")
+            kind, start = sent.popleft()
+            latencies.append(time.perf_counter() - start)
+            if line.startswith(b"ERR"):
+                stats["errors"] += 1
+            elif kind == "guest":
+                rooms.append(int(line[3:]))
+            slots.release()
+
+    receiver = asyncio.create_task(receive())
+    for _ in range(n_requests):
+        await slots.acquire()
+        if rng.random() < write_ratio:
+            kind = "guest"
+            request = "guest " + " ".join(str(rng.randint(0, max_value)) for _ in range(ways))
+        elif rooms and rng.random() < 0.9:
+            kind = "search"
+            request = f"search {rng.choice(rooms)}"
+        else:
+            kind = "range"
+            lo = rng.randint(0, 10 ** 6)
+            request = f"range {lo} {lo + 1000}"
+        stats[kind] += 1
+        sent.append((kind, time.perf_counter()))
+        writer.write(request.encode() + b"\n")
+        await writer.drain()
+    await receiver
+    writer.close()
+
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(int(len(sorted_samples) * fraction), len(sorted_samples) - 1)]
+
+
+async def generate_load(connect, connections=8, requests=10000, depth=32, write_ratio=0.1, ways=3, max_value=20):
+    latencies = []
+    stats = {"guest": 0, "search": 0, "range": 0, "errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        run_connection(connect, requests, depth, write_ratio, ways, max_value, seed, latencies, stats)
+        for seed in range(connections)])
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies), "seconds": elapsed, "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(ordered, 0.5) * 1000, "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000, **stats,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for Server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8642)
+    parser.add_argument("--unix", metavar="PATH")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10000, help="requests per connection")
+    parser.add_argument("--depth", type=int, default=32, help="pipelined requests in flight per connection")
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--ways", type=int, default=3, help="way values sent with each guest")
+    args = parser.parse_args(argv)
+
+    if args.unix:
+        def connect():
+            return asyncio.open_unix_connection(args.unix)
+    else:
+        def connect():
+            return asyncio.open_connection(args.host, args.port)
+    result = asyncio.run(generate_load(connect, args.connections, args.requests, args.depth,
+                                       args.write_ratio, args.ways))
+    print(f"{result['requests']} requests in {result['seconds']:.2f}s: {result['requests_per_sec']:,.0f} req/s  "
+          f"p50 {result['p50_ms']:.2f}ms  p99 {result['p99_ms']:.2f}ms  max {result['max_ms']:.2f}ms")
+    print(f"guests {result['guest']}  searches {result['search']}  ranges {result['range']}  "
+          f"errors {result['errors']}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import random
+import sys
+import tracemalloc
+
+from HashMap import HashTable, OpenHashTable
+from RoomStore import DictStore, ColumnStore
+from Treap import PersistentTreap, Treap
+
+PAIR_SIZE = sys.getsizeof((None, None))
+
+
+def _int_size(value):
+    # Small ints are shared singletons and cost nothing per room.
+    return 0 if -5 <= value <= 256 else sys.getsizeof(value)
+
+
+# Nodes keep their attributes inline until __dict__ is touched, so
+# getsizeof cannot see their real cost; measure a batch of probes instead.
+def _node_size(node_class, probes=256):
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [node_class(0) for _ in range(probes)]
+    size = (tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(nodes)) // probes
+    if not tracing:
+        tracemalloc.stop()
+    return size
+
+
+NODE_SIZE = _node_size(Treap.Node)
+PERSISTENT_NODE_SIZE = _node_size(PersistentTreap.Node)
+
+
+# Picks rooms uniformly through the treap's order statistics and returns
+# them with the factor that scales per-room sums up to the whole hotel.
+def _sample_rooms(treap, sample_size, exact):
+    n = len(treap)
+    if exact or n <= sample_size:
+        return list(treap.iter_from()), 1.0
+    return [treap.select(random.randrange(n)) for _ in range(sample_size)], n / sample_size
+
+
+def _sample(values, sample_size, exact):
+    if exact or len(values) <= sample_size:
+        return values, 1.0
+    return random.sample(values, sample_size), len(values) / sample_size
+
+
+def _bucket_of(table, room_num):
+    bucket = table.table[room_num % table.size]
+    if bucket and any(k == room_num for k, _ in bucket):
+        return bucket
+    return table.old_table[room_num % table.old_size]
+
+
+# Breaks the hotel's memory down by component in bytes. Array-backed parts
+# are measured directly; per-room objects are estimated from a sample of
+# sample_size rooms unless exact is set, which visits every room.
+def memory_report(hotel, sample_size=1000, exact=False):
+    report = {}
+    table, treap, store = hotel.hash, hotel.treap, hotel.store
+    rooms, scale = _sample_rooms(treap, sample_size, exact)
+
+    if isinstance(table, HashTable):
+        report["hash table"] = sys.getsizeof(table.table)
+        if table.old_table is not None:
+            report["hash table"] += sys.getsizeof(table.old_table)
+        bucket_bytes = 0.0
+        for room_num in rooms:
+            bucket = _bucket_of(table, room_num)
+            bucket_bytes += sys.getsizeof(bucket) / len(bucket)
+        report["bucket lists"] = int(bucket_bytes * scale)
+        report["entry tuples"] = table.count * PAIR_SIZE
+    elif isinstance(table, OpenHashTable):
+        report["hash table"] = (sys.getsizeof(table.keys) + sys.getsizeof(table.values)
+                                + sys.getsizeof(table.hashes))
+
+    filters = [table.bloom, getattr(table, "old_bloom", None)]
+    if any(filters):
+        report["bloom filter"] = sum(sys.getsizeof(f.counters) for f in filters if f is not None)
+
+    if isinstance(treap, PersistentTreap):
+        report["treap nodes"] = len(treap) * PERSISTENT_NODE_SIZE
+    elif isinstance(treap, Treap):
+        report["treap nodes"] = len(treap) * NODE_SIZE
+    else:
+        report["treap arrays"] = sum(sys.getsizeof(part) for part in (
+            treap.keys, treap.priority, treap.left, treap.right, treap.size, treap.free))
+
+    report["room numbers"] = int(sum(_int_size(room_num) for room_num in rooms) * scale)
+
+    if isinstance(store, DictStore):
+        detail_bytes = 0
+        for room_num in rooms:
+            details = table.search(room_num)
+            detail_bytes += sys.getsizeof(details)
+            detail_bytes += sum(_int_size(value) for value in details.values() if type(value) is int)
+        report["detail dicts"] = int(detail_bytes * scale)
+    elif isinstance(store, ColumnStore):
+        report["room columns"] = sum(sys.getsizeof(column) for column in store.columns.values()) + sum(
+            sys.getsizeof(part) for part in (store.epochs, store.flags_column, store.births, store.free))
+
+    index_bytes = 0
+    for index in hotel.indexes.values():
+        index_bytes += sys.getsizeof(index.rooms) + sys.getsizeof(index.values)
+        values, value_scale = _sample(index.values, sample_size, exact)
+        index_bytes += int(sum(sys.getsizeof(index.rooms[value]) + _int_size(value)
+                               for value in values) * value_scale)
+    report["way indexes"] = index_bytes
+
+    # What the hotel keeps for pinned snapshots until they are released.
+    history = getattr(table, "history", None)
+    if history or any(index.born or index.retired for index in hotel.indexes.values()):
+        report["snapshot history"] = (sys.getsizeof(history) + sum(sys.getsizeof(entries) for entries in history.values())
+                                      if history else 0) + sum(
+            sys.getsizeof(index.born) + sys.getsizeof(index.retired) for index in hotel.indexes.values())
+    return report
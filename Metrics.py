@@ -0,0 +1,206 @@
+import sys
+import threading
+import time
+
+
+class Histogram:
+    # Bucket i counts observations below 2**i (bucket 0 holds zeros).
+    def __init__(self):
+        self.counts = [0] * 65
+        self.count = 0
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[int(value).bit_length()] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, fraction):
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, hits in enumerate(self.counts):
+            seen += hits
+            if seen >= rank:
+                return 0 if i == 0 else 2 ** i
+        return 2 ** 64
+
+    def summary(self, scale=1):
+        return {
+            "count": self.count, "sum": self.total / scale,
+            "p50": None if not self.count else self.quantile(0.5) / scale,
+            "p99": None if not self.count else self.quantile(0.99) / scale,
+            "buckets": {2 ** i / scale: hits for i, hits in enumerate(self.counts) if hits},
+        }
+
+
+# Counters, histograms and gauges for one hotel. Everything is off until
+# enable(); callers check `enabled` before recording so the disabled cost is
+# one attribute lookup. Gauges are functions evaluated only on export, and
+# only on the thread that owns the hotel: a reporter thread exports the
+# values that thread last published through tick() or publish_gauges().
+class Metrics:
+    def __init__(self, prefix="hotel"):
+        self.prefix = prefix
+        self.enabled = False
+        self.counters = {}
+        self.latencies = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.counter_sources = {}
+        self.published = {}
+        self.published_counters = {}
+        self.publish_interval = None
+        self.next_publish = 0.0
+        self.reporter = None
+        self.stop_reporting = threading.Event()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.counters = {}
+        self.latencies = {}
+        self.histograms = {}
+
+    def inc(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_latency(self, operation, elapsed_ns):
+        histogram = self.latencies.get(operation)
+        if histogram is None:
+            histogram = self.latencies[operation] = Histogram()
+        histogram.observe(elapsed_ns)
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def register_gauge(self, name, func):
+        self.gauges[name] = func
+
+    # Like a gauge, but for a running count kept by some structure; it is
+    # exported with the counters.
+    def register_counter(self, name, func):
+        self.counter_sources[name] = func
+
+    def read_gauges(self):
+        return _read(self.gauges)
+
+    def read_counters(self):
+        return dict(self.counters, **_read(self.counter_sources))
+
+    def publish_gauges(self):
+        self.published = self.read_gauges()
+        self.published_counters = _read(self.counter_sources)
+        if self.publish_interval is not None:
+            self.next_publish = time.monotonic() + self.publish_interval
+
+    # Called by the owning thread after its operations; republishes the
+    # gauges once the reporter's interval has passed.
+    def tick(self):
+        if self.publish_interval is not None and time.monotonic() >= self.next_publish:
+            self.publish_gauges()
+
+    # The dicts are copied before they are walked, since the owning thread
+    # may add entries while another thread exports.
+    def snapshot(self, published=False):
+        return {
+            "timestamp": time.time(),
+            "counters": dict(self.counters, **self.published_counters) if published else self.read_counters(),
+            "latency_seconds": {op: h.summary(1e9) for op, h in dict(self.latencies).items()},
+            "histograms": {name: h.summary() for name, h in dict(self.histograms).items()},
+            "gauges": dict(self.published) if published else self.read_gauges(),
+        }
+
+    def prometheus(self, published=False):
+        lines = []
+        counters = dict(self.counters, **self.published_counters) if published else self.read_counters()
+        for name, value in sorted(counters.items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        if self.latencies:
+            metric = f"{self.prefix}_operation_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for op, histogram in sorted(dict(self.latencies).items()):
+                lines.extend(_histogram_lines(metric, histogram, 1e9, f'op="{op}",'))
+        for name, histogram in sorted(dict(self.histograms).items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            lines.extend(_histogram_lines(metric, histogram, 1, ""))
+        gauges = dict(self.published) if published else self.read_gauges()
+        for name, value in sorted(gauges.items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Calls sink(snapshot) every interval seconds from a daemon thread, with
+    # the gauges last published by the owning thread. A failing sink is
+    # reported and the reporter carries on.
+    def start_reporter(self, interval, sink):
+        self.stop_reporter()
+        self.stop_reporting.clear()
+        self.publish_interval = interval
+        self.publish_gauges()
+
+        def report():
+            while not self.stop_reporting.wait(interval):
+                try:
+                    sink(self.snapshot(published=True))
+                except Exception as e:
+                    print(f"Error reporting metrics: {e!r}", file=sys.stderr)
+
+        self.reporter = threading.Thread(target=report, daemon=True)
+        self.reporter.start()
+
+    def stop_reporter(self):
+        if self.reporter is not None:
+            self.stop_reporting.set()
+            self.reporter.join()
+            self.reporter = None
+        self.publish_interval = None
+
+
+# A function may return a dict to report several related values from one
+# computation; they are exported as name_key.
+def _read(funcs):
+    values = {}
+    for name, func in funcs.items():
+        value = func()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                values[f"{name}_{key}"] = item
+        elif value is not None:
+            values[name] = value
+    return values
+
+
+def _histogram_lines(metric, histogram, scale, labels):
+    lines = []
+    cumulative = 0
+    last = max((i for i, hits in enumerate(histogram.counts) if hits), default=0)
+    for i in range(last + 1):
+        cumulative += histogram.counts[i]
+        lines.append(f'{metric}_bucket{{{labels}le="{2 ** i / scale:g}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+    label_set = f"{{{labels.rstrip(',')}}}" if labels else ""
+    lines.append(f"{metric}_sum{label_set} {histogram.total / scale:g}")
+    lines.append(f"{metric}_count{label_set} {histogram.count}")
+    return lines
+
+
+def json_lines_sink(path):
+    import json
+
+    def sink(snapshot):
+        with open(path, "a") as f:
+            f.write(json.dumps(snapshot) + "\n")
+    return sink
@@ -0,0 +1,37 @@
+import os
+
+from HashMap import prehash
+from RoomNumber import gamma_room_numbers, prime_power_room_numbers, nested_matrix_slice
+
+PARALLEL_MIN_GUESTS = 100000
+
+
+def _arrival_chunk(task):
+    counts, start, stop, scheme, primes, spec = task
+    matrix = nested_matrix_slice(counts, start, stop)
+    if scheme == "gamma":
+        targets = gamma_room_numbers(matrix)
+    else:
+        targets = prime_power_room_numbers(matrix, primes)
+    return targets, prehash(spec, targets)
+
+
+# Workers compute room numbers and their hash-table slots for contiguous
+# slices of the nested product; results are yielded in product order so
+# the caller assigns rooms exactly as the serial path would.
+def parallel_nested_arrival(counts, scheme, primes, spec, workers=None, chunk_size=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    total = 1
+    for c in counts:
+        total *= c
+    if chunk_size is None:
+        chunk_size = max(1, -(-total // (workers * 4)))
+    tasks = [(list(counts), start, min(start + chunk_size, total), scheme, list(primes), spec)
+             for start in range(0, total, chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for task, (targets, slots) in zip(tasks, pool.map(_arrival_chunk, tasks)):
+            matrix = nested_matrix_slice(counts, task[1], task[2])
+            rows = matrix.tolist() if hasattr(matrix, 'tolist') else matrix
+            yield from zip(rows, targets, slots)
@@ -0,0 +1,74 @@
+import bisect
+import itertools
+
+
+class PrimeTable:
+    def __init__(self, limit: int = 1024):
+        self.primes = []
+        self.limit = 2
+        self.capacities = []
+        self.extend_to(limit)
+
+    # Sieves [self.limit, limit) one segment at a time; the base primes for
+    # a segment are always already known because segments grow at most to
+    # the square of the current limit.
+    def extend_to(self, limit):
+        while self.limit < limit:
+            lo = self.limit
+            hi = min(limit, lo * lo, lo + (1 << 16))
+            self.primes.extend(self.sieve_window(lo, hi))
+            self.limit = hi
+
+    def sieve_window(self, lo, hi):
+        segment = bytearray([1]) * (hi - lo)
+        for p in self.primes:
+            if p * p >= hi:
+                break
+            start = max(p * p, (lo + p - 1) // p * p)
+            segment[start - lo::p] = bytes(len(range(start - lo, hi - lo, p)))
+        for n in range(lo, min(hi, 2)):
+            segment[n - lo] = 0
+        return itertools.compress(range(lo, hi), segment)
+
+    def first(self, n):
+        while len(self.primes) < n:
+            self.extend_to(self.limit * 2)
+        return self.primes
+
+    def is_prime(self, n):
+        if n < self.limit:
+            i = bisect.bisect_left(self.primes, n)
+            return i < len(self.primes) and self.primes[i] == n
+        self.extend_to(int(n ** 0.5) + 2)
+        for p in self.primes:
+            if p * p > n:
+                return True
+            if n % p == 0:
+                return False
+        return True
+
+    def next_prime(self, n):
+        if n < self.limit:
+            i = bisect.bisect_left(self.primes, n)
+            if i < len(self.primes):
+                return self.primes[i]
+            n = self.limit
+        width = 256
+        while True:
+            self.extend_to(int((n + width) ** 0.5) + 2)
+            for p in self.sieve_window(n, n + width):
+                return p
+            n += width
+
+    # Primes roughly halfway between consecutive powers of two, which keep
+    # key % size well spread for room numbers built from small factors.
+    def capacity_at_least(self, n):
+        if not self.capacities or self.capacities[-1] < n:
+            k = len(self.capacities) + 3
+            while not self.capacities or self.capacities[-1] < n:
+                self.capacities.append(self.next_prime(3 << (k - 1)))
+                k += 1
+        return self.capacities[bisect.bisect_left(self.capacities, n)]
+
+
+PRIMES = PrimeTable()
@@ -0,0 +1,112 @@
+import weakref
+
+from Hotel import write_csv
+from RoomStore import INITIAL, MANUAL
+
+
+# A hotel as it was when Hotel.snapshot() was called. It shares the
+# persistent treap's root, a view of the versioned hash buckets and way
+# indexes, and the store's rows, so taking it copies nothing that grows
+# with the hotel, and reads can take as long as they need on another
+# thread while arrivals keep writing. close() (or garbage collection)
+# releases its version so the hotel can drop what it kept for it; the
+# view must not be read after that.
+class ReadView:
+    def __init__(self, hotel):
+        clock = hotel.clock
+        self.version = clock.pin()
+        self.treap = hotel.treap.frozen()
+        self.hash = hotel.hash.view(self.version)
+        self.store = hotel.store.frozen()
+        self.dimensions = list(hotel.dimensions)
+        self.indexes = {name: index.view(self.version) for name, index in hotel.indexes.items()}
+        self.epoch = hotel.epoch
+        self.room_count = hotel.room_count
+        self.new_count = hotel.guest_status_summary()[1]
+        self.initial_count = hotel.initial_count
+        self.manual_count = hotel.manual_count
+        self._release = weakref.finalize(self, clock.release, self.version)
+
+    def close(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def epoch_status(self, epoch):
+        if self.epoch > 0 and epoch == self.epoch:
+            return 'new'
+        return 'old'
+
+    def status_of(self, details):
+        return self.epoch_status(details.get('epoch', 0))
+
+    # Room details limited to the ways the hotel had at snapshot time.
+    def details(self, handle):
+        store = self.store
+        flags = store.flags(handle)
+        if flags & MANUAL:
+            return {"manually added": '', 'epoch': store.epoch(handle)}
+        details = {}
+        for dimension_name in self.dimensions:
+            value = store.value(handle, dimension_name)
+            if value is not None:
+                details[dimension_name] = value
+        details['epoch'] = store.epoch(handle)
+        if flags & INITIAL:
+            details['initial'] = True
+        return details
+
+    def search(self, room_num):
+        handle = self.hash.search(room_num)
+        if handle is None:
+            return None
+        return self.details(handle)
+
+    def guest_status(self, room_num):
+        handle = self.hash.search(room_num)
+        if handle is None:
+            return None
+        return self.epoch_status(self.store.epoch(handle))
+
+    def guest_count(self):
+        return self.room_count
+
+    def guest_status_summary(self):
+        return self.room_count - self.new_count, self.new_count
+
+    def sort(self):
+        return self.treap.InOrder()
+
+    def rooms_between(self, lo, hi):
+        return self.treap.range(lo, hi)
+
+    def kth_room(self, k):
+        return self.treap.select(k - 1)
+
+    def track_by_dimension(self, dimension_name, value):
+        if dimension_name not in self.indexes:
+            return []
+        rooms = self.indexes[dimension_name].lookup(value)
+        return [(room_num, self.details(self.hash.search(room_num))) for room_num in sorted(rooms)]
+
+    def track_range(self, dimension_name, lo, hi):
+        if dimension_name not in self.indexes:
+            return []
+        rooms = self.indexes[dimension_name].between(lo, hi)
+        return [(room_num, self.details(self.hash.search(room_num))) for room_num in sorted(rooms)]
+
+    def export_rows(self, start=None):
+        for room_num in self.treap.iter_from(start):
+            handle = self.hash.search(room_num)
+            row = [room_num, self.epoch_status(self.store.epoch(handle))]
+            for dimension_name in self.dimensions:
+                value = self.store.value(handle, dimension_name)
+                row.append("" if value is None else value)
+            yield row
+
+    def write_file(self, file_name, compress=None, chunk_size=10000):
+        return write_csv(file_name, self.dimensions, self.export_rows(), compress, chunk_size)
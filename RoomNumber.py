@@ -0,0 +1,147 @@
+import itertools
+
+_numpy = False
+
+
+# NumPy is imported on first use so that importing the hotel stays cheap;
+# returns None when it is not installed.
+def load_numpy():
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+ROOM_SCHEMES = ("prime", "gamma")
+
+
+def prime_power_room_number(values, primes) -> int:
+    room_num = 1
+    for i, value in enumerate(values):
+        room_num *= ((value + 1) ** primes[i])
+    return room_num
+
+
+# Elias-gamma code of every (value + 1) behind a leading 1 bit. Trailing
+# zero values are dropped so a vector keeps its room number when a new way
+# is added, same as with the prime-power scheme.
+def gamma_room_number(values) -> int:
+    end = len(values)
+    while end and values[end - 1] == 0:
+        end -= 1
+    room_num = 1
+    for i in range(end):
+        x = values[i] + 1
+        room_num = (room_num << (2 * x.bit_length() - 1)) | x
+    return room_num
+
+
+def gamma_room_values(room_num: int) -> list:
+    bits = bin(room_num)[3:]
+    values = []
+    pos = 0
+    while pos < len(bits):
+        zeros = 0
+        while bits[pos] == '0':
+            zeros += 1
+            pos += 1
+        values.append(int(bits[pos:pos + zeros + 1], 2) - 1)
+        pos += zeros + 1
+    return values
+
+
+# Batched variants take an (n_guests x n_ways) matrix and return a list of
+# Python ints. With NumPy they stay vectorized while every key fits in
+# uint64 and fall back to exact Python ints otherwise.
+def prime_power_room_numbers(matrix, primes) -> list:
+    np = load_numpy()
+    if np is None or not isinstance(matrix, np.ndarray) or matrix.size == 0:
+        return [prime_power_room_number(values, primes) for values in _rows(matrix)]
+    bound = 1
+    for i, top in enumerate(matrix.max(axis=0).tolist()):
+        bound *= (top + 1) ** primes[i]
+    if bound >= 2 ** 64:
+        return [prime_power_room_number(values, primes) for values in matrix.tolist()]
+    room_nums = np.ones(len(matrix), dtype=np.uint64)
+    for i in range(matrix.shape[1]):
+        room_nums *= (matrix[:, i].astype(np.uint64) + np.uint64(1)) ** np.uint64(primes[i])
+    return room_nums.tolist()
+
+
+def gamma_room_numbers(matrix) -> list:
+    np = load_numpy()
+    if np is None or not isinstance(matrix, np.ndarray) or matrix.size == 0:
+        return [gamma_room_number(values) for values in _rows(matrix)]
+    x = matrix.astype(np.uint64) + np.uint64(1)
+    if int(x.max()) >= 2 ** 52:
+        return [gamma_room_number(values) for values in matrix.tolist()]
+    lengths = np.frexp(x.astype(np.float64))[1].astype(np.uint64)
+    nonzero = matrix != 0
+    active = np.flip(np.logical_or.accumulate(np.flip(nonzero, axis=1), axis=1), axis=1)
+    widths = np.where(active, np.uint64(2) * lengths - np.uint64(1), np.uint64(0))
+    if int(widths.sum(axis=1).max()) >= 63:
+        return [gamma_room_number(values) for values in matrix.tolist()]
+    room_nums = np.ones(len(matrix), dtype=np.uint64)
+    for i in range(matrix.shape[1]):
+        shifted = (room_nums << widths[:, i]) | x[:, i]
+        room_nums = np.where(active[:, i], shifted, room_nums)
+    return room_nums.tolist()
+
+
+def _rows(matrix):
+    np = load_numpy()
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix.tolist()
+    return matrix
+
+
+def as_matrix(values_list):
+    np = load_numpy()
+    if np is None:
+        return values_list if isinstance(values_list, list) else list(values_list)
+    if isinstance(values_list, np.ndarray):
+        return values_list
+    return np.array(list(values_list), dtype=np.int64)
+
+
+def nested_matrix(counts):
+    np = load_numpy()
+    if np is None:
+        return [list(combo) for combo in itertools.product(*[range(1, c + 1) for c in counts])]
+    grids = np.meshgrid(*[np.arange(1, c + 1, dtype=np.int64) for c in counts], indexing='ij')
+    return np.stack(grids, axis=-1).reshape(-1, len(counts))
+
+
+def nested_matrix_slice(counts, start, stop):
+    np = load_numpy()
+    if np is None:
+        rows = []
+        digits = []
+        index = start
+        for c in reversed(counts):
+            index, digit = divmod(index, c)
+            digits.append(digit)
+        digits.reverse()
+        for _ in range(start, stop):
+            rows.append([digit + 1 for digit in digits])
+            for i in range(len(counts) - 1, -1, -1):
+                digits[i] += 1
+                if digits[i] < counts[i]:
+                    break
+                digits[i] = 0
+        return rows
+    flat = np.arange(start, stop, dtype=np.int64)
+    return np.stack(np.unravel_index(flat, counts), axis=-1).astype(np.int64) + 1
+
+
+def initial_matrix(n, ways):
+    np = load_numpy()
+    if np is None:
+        padding = [0] * (ways - 1)
+        return [[i] + padding for i in range(n)]
+    matrix = np.zeros((n, ways), dtype=np.int64)
+    matrix[:, 0] = np.arange(n, dtype=np.int64)
+    return matrix
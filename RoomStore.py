@@ -0,0 +1,233 @@
+from array import array
+import copy
+from collections.abc import Mapping
+
+INITIAL = 1
+MANUAL = 2
+
+
+class DictStore:
+    def add(self, dimensions, values, epoch, flags=0):
+        if flags & MANUAL:
+            return {"manually added": '', 'epoch': epoch}
+        details = {dimensions[i]: values[i] for i in range(len(values))}
+        details['epoch'] = epoch
+        if flags & INITIAL:
+            details['initial'] = True
+        return details
+
+    def release(self, handle):
+        pass
+
+    def view(self, handle):
+        return handle
+
+    def drain(self):
+        pass
+
+    # Dicts never change once written, apart from column changes, so a
+    # snapshot can read the live store.
+    def frozen(self):
+        return self
+
+    def value(self, handle, name):
+        return handle.get(name)
+
+    def epoch(self, handle):
+        return handle.get('epoch', 0)
+
+    def flags(self, handle):
+        return (INITIAL if 'initial' in handle else 0) | (MANUAL if 'manually added' in handle else 0)
+
+    def add_column(self, name, handles):
+        for details in handles:
+            if details is not None:
+                if 'initial' not in details and 'manually added' not in details:
+                    details[name] = 0
+
+    def drop_column(self, name, handles):
+        for details in handles:
+            if details and name in details:
+                del details[name]
+
+    # Like drop_column, but leaves the dicts alone for snapshots that still
+    # read them; returns copies without the column for the caller to swap in.
+    def drop_column_shared(self, name, items):
+        return [(key, {k: v for k, v in details.items() if k != name})
+                for key, details in items if details and name in details]
+
+    def load_rows(self, dimensions, epochs, flags, columns, absent=-1):
+        handles = []
+        for row in range(len(epochs)):
+            if flags[row] & MANUAL:
+                handles.append({"manually added": '', 'epoch': epochs[row]})
+                continue
+            details = {}
+            for name in dimensions:
+                value = columns[name][row]
+                if value != absent:
+                    details[name] = value
+            details['epoch'] = epochs[row]
+            if flags[row] & INITIAL:
+                details['initial'] = True
+            handles.append(details)
+        return handles
+
+
+class RoomView(Mapping):
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, name):
+        store, row = self.store, self.row
+        if name == 'epoch':
+            return store.epochs[row]
+        if name == 'initial' and store.flags_column[row] & INITIAL:
+            return True
+        if name == 'manually added' and store.flags_column[row] & MANUAL:
+            return ''
+        value = store.value(row, name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        store, row = self.store, self.row
+        flags = store.flags_column[row]
+        if flags & MANUAL:
+            yield 'manually added'
+        else:
+            for name in store.columns:
+                if store.present(row, name):
+                    yield name
+        yield 'epoch'
+        if flags & INITIAL:
+            yield 'initial'
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+# One array('q') per arrival way plus epoch and flag columns, addressed by
+# row id. An initial room only has the ways that existed when its row was
+# written, so each row remembers the column serial it was born under.
+class ColumnStore:
+    def __init__(self):
+        self.columns = {}
+        self.serials = {}
+        self.next_serial = 0
+        self.epochs = array('q')
+        self.flags_column = bytearray()
+        self.births = array('q')
+        self.free = []
+        # Rows released while a snapshot is pinned; reused after drain().
+        self.clock = None
+        self.retired = []
+
+    def __len__(self):
+        return len(self.epochs) - len(self.free)
+
+    def add(self, dimensions, values, epoch, flags=0):
+        if self.free:
+            row = self.free.pop()
+            self.epochs[row] = epoch
+            self.flags_column[row] = flags
+            self.births[row] = self.next_serial
+            for column in self.columns.values():
+                column[row] = 0
+        else:
+            row = len(self.epochs)
+            self.epochs.append(epoch)
+            self.flags_column.append(flags)
+            self.births.append(self.next_serial)
+            for column in self.columns.values():
+                column.append(0)
+        if not flags & MANUAL:
+            for i in range(len(values)):
+                self.columns[dimensions[i]][row] = values[i]
+            if flags & INITIAL and len(values) < len(dimensions):
+                self.births[row] = self.serials[dimensions[len(values)]]
+        return row
+
+    def release(self, row):
+        if self.clock is not None and self.clock.readers:
+            self.retired.append(row)
+            return
+        self.flags_column[row] = 0
+        self.free.append(row)
+
+    def drain(self):
+        for row in self.retired:
+            self.flags_column[row] = 0
+        self.free.extend(self.retired)
+        self.retired = []
+
+    # Shares the row arrays, whose rows stay put while a snapshot is pinned,
+    # and copies the column tables so later way changes don't show through.
+    def frozen(self):
+        view = copy.copy(self)
+        view.columns = dict(self.columns)
+        view.serials = dict(self.serials)
+        return view
+
+    def view(self, row):
+        return RoomView(self, row)
+
+    def present(self, row, name):
+        flags = self.flags_column[row]
+        if flags & MANUAL:
+            return False
+        if flags & INITIAL and self.serials[name] >= self.births[row]:
+            return False
+        return True
+
+    def value(self, row, name):
+        if name not in self.columns or not self.present(row, name):
+            return None
+        return self.columns[name][row]
+
+    def epoch(self, row):
+        return self.epochs[row]
+
+    def flags(self, row):
+        return self.flags_column[row]
+
+    def add_column(self, name, handles=None):
+        self.columns[name] = array('q', bytes(8 * len(self.epochs)))
+        self.serials[name] = self.next_serial
+        self.next_serial += 1
+
+    def drop_column(self, name, handles=None):
+        del self.columns[name]
+        del self.serials[name]
+
+    def drop_column_shared(self, name, items):
+        self.drop_column(name)
+        return []
+
+    # Adopts whole columns as row ids 0..n-1. An initial room's present
+    # ways are always a prefix of the way list, so its birth serial is the
+    # position of its first absent way.
+    def load_rows(self, dimensions, epochs, flags, columns, absent=-1):
+        n = len(epochs)
+        self.columns = {name: columns[name] for name in dimensions}
+        self.serials = {name: serial for serial, name in enumerate(dimensions)}
+        self.next_serial = len(dimensions)
+        self.epochs = epochs
+        self.flags_column = flags
+        self.births = array('q', [self.next_serial]) * n
+        self.free = []
+        for row in range(n):
+            if flags[row] & INITIAL:
+                for serial, name in enumerate(dimensions):
+                    if columns[name][row] == absent:
+                        self.births[row] = serial
+                        break
+        return range(n)
+
+
+STORE_TYPES = {"dict": DictStore, "columnar": ColumnStore}
@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from BatchRunner import execute, parse_command
+from Hotel import Hotel
+from HashMap import TABLE_TYPES
+from RoomNumber import ROOM_SCHEMES, initial_matrix
+from RoomStore import STORE_TYPES
+from Treap import TREAP_TYPES
+
+# The protocol is one BatchRunner command per line; every request gets one
+# response line, "OK ..." or "ERR ...", in the order it was sent.
+READS = ("search", "track", "range", "count")
+WRITES = ("guest", "add", "nested-add", "delete", "manual", "way", "remove-way")
+
+
+class RWLock:
+    # Writers wait for active readers to leave and block new ones while
+    # they wait. Readers only suspend when a writer is active or queued.
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire_read(self):
+        if self.writer or self.waiting_writers:
+            async with self.condition:
+                await self.condition.wait_for(lambda: not self.writer and not self.waiting_writers)
+        self.readers += 1
+
+    async def release_read(self):
+        self.readers -= 1
+        if not self.readers and self.waiting_writers:
+            async with self.condition:
+                self.condition.notify_all()
+
+    async def acquire_write(self):
+        async with self.condition:
+            self.waiting_writers += 1
+            await self.condition.wait_for(lambda: not self.writer and not self.readers)
+            self.waiting_writers -= 1
+            self.writer = True
+
+    async def release_write(self):
+        async with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+
+# Hotel reports through print. While a server runs, sys.stdout is replaced
+# by this, so whatever a command prints on its thread is captured for its
+# response instead of reaching the server's own output.
+class CommandOutput(io.TextIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    @contextlib.contextmanager
+    def capture(self):
+        self.local.buffer = io.StringIO()
+        try:
+            yield self.local.buffer
+        finally:
+            self.local.buffer = None
+
+
+# Reads run on the event loop thread. Writes from every connection are
+# queued and applied in batches by one task that runs them in an executor.
+# When the hotel supports snapshots (persistent treap, chained table) each
+# batch pins one before it starts and reads are answered from it, so they
+# never wait for the batch. Otherwise reads and batches share an RWLock
+# and a read waits for the whole batch in progress.
+class HotelServer:
+    def __init__(self, hotel, max_batch=10000):
+        self.hotel = hotel
+        self.max_batch = max_batch
+        self.lock = None
+        self.writes = None
+        self.write_task = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.output = None
+        self.view = None
+        self.use_views = hotel.treap_kind == "persistent" and hotel.table_kind != "open"
+        self.batches = 0
+        self.batched_writes = 0
+
+    async def start(self, host="127.0.0.1", port=8642, unix_path=None):
+        self.lock = RWLock()
+        self.writes = asyncio.Queue()
+        self.write_task = asyncio.create_task(self.apply_writes())
+        self.output = CommandOutput(sys.stdout)
+        sys.stdout = self.output
+        if unix_path:
+            return await asyncio.start_unix_server(self.handle, path=unix_path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader, writer):
+        responses = asyncio.Queue()
+        sender = asyncio.create_task(self.send(responses, writer))
+        last_write = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    command = parse_command(line.decode())
+                except ValueError as e:
+                    responses.put_nowait(f"ERR {e}")
+                    continue
+                if command is None:
+                    continue
+                name, args = command
+                if name in READS:
+                    # A connection always sees its own earlier writes.
+                    if last_write is not None and not last_write.done():
+                        await last_write
+                    responses.put_nowait(await self.read(name, args))
+                elif name in WRITES:
+                    last_write = asyncio.get_running_loop().create_future()
+                    self.writes.put_nowait((name, args, last_write))
+                    responses.put_nowait(last_write)
+                else:
+                    responses.put_nowait(f"ERR '{name}' is not available over the server")
+        except ConnectionError:
+            pass
+        finally:
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+
+    async def send(self, responses, writer):
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            if not isinstance(response, str):
+                response = await response
+            writer.write(response.encode() + b"\n")
+            if responses.empty():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    break
+
+    def close(self):
+        if self.write_task is not None:
+            self.write_task.cancel()
+        self.executor.shutdown(wait=True)
+        if self.output is not None and sys.stdout is self.output:
+            sys.stdout = self.output.stream
+        self.output = None
+
+    def captured(self):
+        if self.output is None:
+            return contextlib.nullcontext(io.StringIO())
+        return self.output.capture()
+
+    async def read(self, name, args):
+        view = self.view
+        if view is not None:
+            return self.run(name, args, view)
+        await self.lock.acquire_read()
+        try:
+            return self.run(name, args)
+        finally:
+            await self.lock.release_read()
+
+    # A failed command is answered with the last line the hotel printed
+    # about it, when it printed anything.
+    def run(self, name, args, hotel=None):
+        out = io.StringIO()
+        with self.captured() as printed:
+            try:
+                ok = execute(self.hotel if hotel is None else hotel, name, args, out)
+            except Exception as e:
+                return f"ERR {e}"
+        if not ok:
+            lines = printed.getvalue().strip().splitlines()
+            message = lines[-1].removeprefix("Error: ") if lines else f"{name} failed"
+            return f"ERR {message}"
+        return f"OK {out.getvalue().strip()}".rstrip()
+
+    async def apply_writes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.writes.get()]
+            while not self.writes.empty() and len(batch) < self.max_batch:
+                batch.append(self.writes.get_nowait())
+            commands = [(n, a) for n, a, _ in batch]
+            if self.use_views:
+                # No write is running here, so the snapshot can be taken on
+                # this thread; reads switch to it until the batch is done.
+                self.view = self.hotel.snapshot()
+                try:
+                    results = await loop.run_in_executor(self.executor, self.apply, commands)
+                except Exception as e:
+                    results = [f"ERR {e}"] * len(batch)
+                finally:
+                    view, self.view = self.view, None
+                    view.close()
+            else:
+                await self.lock.acquire_write()
+                try:
+                    results = await loop.run_in_executor(self.executor, self.apply, commands)
+                except Exception as e:
+                    results = [f"ERR {e}"] * len(batch)
+                finally:
+                    await self.lock.release_write()
+            self.batches += 1
+            self.batched_writes += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    # Consecutive guests in a batch become one bulk arrival; each is
+    # answered with the room it was given. Errors are answered per command,
+    # or per bulk arrival, so the writes before one still report OK.
+    def apply(self, batch):
+        results = []
+        guests = []
+
+        def flush_guests():
+            if guests:
+                try:
+                    with self.captured():
+                        room_nums = self.hotel.add_rooms_bulk(guests)
+                    results.extend(f"OK {room_num}" for room_num in room_nums)
+                except Exception as e:
+                    results.extend([f"ERR {e}"] * len(guests))
+                guests.clear()
+
+        for name, args in batch:
+            if name == "guest" and len(args) == len(self.hotel.dimensions):
+                guests.append(args)
+                continue
+            flush_guests()
+            if name == "guest":
+                results.append(f"ERR expected {len(self.hotel.dimensions)} way values")
+            else:
+                results.append(self.run(name, args))
+        flush_guests()
+        return results
+
+
+async def serve(hotel, host="127.0.0.1", port=8642, unix_path=None):
+    server = HotelServer(hotel)
+    listener = await server.start(host, port, unix_path)
+    where = unix_path or f"{host}:{port}"
+    print(f"Serving {hotel.guest_count()} rooms on {where}", file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a hotel over TCP or a Unix socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8642)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--snapshot", help="load the hotel from this snapshot")
+    parser.add_argument("--ways", nargs="+", default=["way0", "way1", "way2"])
+    parser.add_argument("--initial", type=int, default=0, help="initial guests when not loading a snapshot")
+    parser.add_argument("--scheme", choices=ROOM_SCHEMES, default="prime")
+    parser.add_argument("--table", choices=tuple(TABLE_TYPES), default="chained")
+    parser.add_argument("--treap", choices=tuple(TREAP_TYPES), default="persistent",
+                        help="reads only wait for write batches when this is not 'persistent'")
+    parser.add_argument("--storage", choices=tuple(STORE_TYPES), default="dict")
+    parser.add_argument("--bloom", action="store_true", help="put a Bloom filter in front of the hash table")
+    args = parser.parse_args(argv)
+
+    hotel = Hotel(room_scheme=args.scheme, table=args.table, treap=args.treap, storage=args.storage, bloom=args.bloom)
+    if args.snapshot:
+        if not hotel.load_snapshot(args.snapshot):
+            return 1
+    else:
+        for way in args.ways:
+            if hotel.add_dimension(way) < 0:
+                return 1
+        hotel.add_rooms_bulk(initial_matrix(args.initial, len(hotel.dimensions)), is_initial=True)
+    try:
+        asyncio.run(serve(hotel, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
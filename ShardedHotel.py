@@ -0,0 +1,437 @@
+import bisect
+import heapq
+import multiprocessing
+from operator import itemgetter
+
+from Hotel import Hotel, write_csv
+from Primes import PRIMES
+from RoomNumber import ROOM_SCHEMES, as_matrix, gamma_room_numbers, nested_matrix, prime_power_room_numbers
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+# Partitions map a room number to its owning shard and to the first room
+# number past the segment that contains it. A guest whose collision probe
+# runs off the end of a segment continues at that number on the next
+# segment's owner; ShardedHotel.add_rooms_bulk settles such guests in
+# input order, so rooms are assigned as on a single hotel.
+class RangePartition:
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        self.shards = len(self.bounds) + 1
+
+    def owner(self, room_num):
+        return bisect.bisect_right(self.bounds, room_num)
+
+    def end(self, room_num):
+        shard = bisect.bisect_right(self.bounds, room_num)
+        return self.bounds[shard] if shard < len(self.bounds) else None
+
+
+# Hashing single room numbers would scatter every probe run across all
+# shards, so blocks of block_size consecutive rooms are hashed instead.
+# Jump consistent hashing only moves about 1/n of the blocks when the n-th
+# shard is added.
+class BlockHashPartition:
+    def __init__(self, shards, block_size=DEFAULT_BLOCK_SIZE):
+        self.shards = shards
+        self.block_size = block_size
+
+    def owner(self, room_num):
+        key = room_num // self.block_size & 0xFFFFFFFFFFFFFFFF
+        shard, candidate = -1, 0
+        while candidate < self.shards:
+            shard = candidate
+            key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+            candidate = int((shard + 1) * ((1 << 31) / ((key >> 33) + 1)))
+        return shard
+
+    def end(self, room_num):
+        return (room_num // self.block_size + 1) * self.block_size
+
+
+PARTITIONS = ("range", "hash")
+
+
+def _room_record(hotel, room_num):
+    handle = hotel.hash.search(room_num)
+    values = []
+    for dimension_name in hotel.dimensions:
+        value = hotel.store.value(handle, dimension_name)
+        if value is None:
+            break
+        values.append(value)
+    return room_num, hotel.store.epoch(handle), hotel.store.flags(handle), values
+
+
+def _details(view):
+    return None if view is None else dict(view)
+
+
+def _extract(hotel, partition, shard):
+    moved = [room_num for room_num in hotel.treap.InOrder() if partition.owner(room_num) != shard]
+    records = [_room_record(hotel, room_num) for room_num in moved]
+    for room_num in moved:
+        hotel._remove_room(room_num)
+    return records
+
+
+# A worker keeps the plan of its last "plan" request until the matching
+# "commit" says how much of it to place.
+_plans = {}
+
+
+def _plan(hotel, rows, targets, limits):
+    plan, overflow = hotel.plan_rooms(rows, targets, limits)
+    _plans[id(hotel)] = plan
+    return len(plan), overflow
+
+
+def _commit(hotel, count, is_initial):
+    return hotel.commit_rooms(_plans.pop(id(hotel))[:count], is_initial)
+
+
+def _adopt(hotel, records):
+    for record in records:
+        hotel._put_room(*record)
+    return len(records)
+
+
+def _sample(hotel, sample_size):
+    n = len(hotel.treap)
+    step = max(1, n // sample_size)
+    return n, [hotel.treap.select(k) for k in range(step // 2, n, step)]
+
+
+def _export_page(hotel, start, page_size):
+    rows = []
+    for row in hotel.export_rows(start):
+        rows.append(row)
+        if len(rows) >= page_size:
+            break
+    return rows
+
+
+SHARD_COMMANDS = {
+    "add_dimension": lambda hotel, name: hotel._append_dimension(name),
+    "remove_dimension": lambda hotel, name: hotel._drop_dimension(name),
+    "mark_old": lambda hotel: hotel.mark_all_guests_as_old(),
+    "set_epoch": lambda hotel, epoch: setattr(hotel, "epoch", epoch),
+    "plan": _plan,
+    "commit": _commit,
+    "search": lambda hotel, room_num: _details(hotel.search(room_num)),
+    "delete": lambda hotel, room_num: hotel._remove_room(room_num),
+    "occupied": lambda hotel, room_num: hotel.hash.search(room_num) is not None,
+    "manual": lambda hotel, room_num, replace: hotel.add_manual_room(room_num, replace),
+    "count": lambda hotel: hotel.guest_count(),
+    "summary": lambda hotel: hotel.guest_status_summary(),
+    "track": lambda hotel, name, lo, hi: [
+        (room_num, dict(details)) for room_num, details in
+        (hotel.track_by_dimension(name, lo) if lo == hi else hotel.track_range(name, lo, hi))],
+    "sort": lambda hotel: hotel.treap.InOrder(),
+    "between": lambda hotel, lo, hi: hotel.rooms_between(lo, hi),
+    "export_page": _export_page,
+    "sample": _sample,
+    "extract": _extract,
+    "adopt": _adopt,
+}
+
+
+def _serve_shard(conn, options):
+    hotel = Hotel(**options)
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        name, args = request
+        try:
+            conn.send((True, SHARD_COMMANDS[name](hotel, *args)))
+        except Exception as e:
+            conn.send((False, e))
+    conn.close()
+
+
+# A facade over one Hotel per worker process. Arrivals are numbered here
+# and routed to the owner of each target room; single-room operations go
+# to the owning shard; counts, tracking and sorted output fan out to every
+# shard and are merged in room order. Every shard keeps the same epoch.
+# Range partitioning without bounds starts with every room on shard 0 and
+# rebalances once the first bulk arrival shows where the rooms are.
+class ShardedHotel:
+    def __init__(self, shards=4, partition="hash", bounds=None, block_size=DEFAULT_BLOCK_SIZE,
+                 room_scheme="prime", **hotel_options):
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unknown partitioning '{partition}', expected one of {PARTITIONS}")
+        if room_scheme not in ROOM_SCHEMES:
+            raise ValueError(f"Unknown room number scheme '{room_scheme}', expected one of {ROOM_SCHEMES}")
+        if shards < 1:
+            raise ValueError("A sharded hotel needs at least one shard")
+        self.room_scheme = room_scheme
+        self.hotel_options = dict(hotel_options, room_scheme=room_scheme)
+        self.dimensions = []
+        self.epoch = 0
+        if partition == "hash":
+            self.partition = BlockHashPartition(shards, block_size)
+        elif bounds is not None:
+            if len(bounds) != shards - 1:
+                raise ValueError(f"{shards} range shards need {shards - 1} bounds")
+            self.partition = RangePartition(bounds)
+        else:
+            self.partition = RangePartition([float("inf")] * (shards - 1))
+        self.needs_bounds = partition == "range" and bounds is None and shards > 1
+        self.context = multiprocessing.get_context()
+        self.workers = []
+        self.conns = []
+        for _ in range(shards):
+            self._start_worker()
+
+    def _start_worker(self):
+        parent, child = self.context.Pipe()
+        worker = self.context.Process(target=_serve_shard, args=(child, self.hotel_options), daemon=True)
+        worker.start()
+        child.close()
+        self.workers.append(worker)
+        self.conns.append(parent)
+
+    @property
+    def shards(self):
+        return len(self.conns)
+
+    def _send(self, shard, name, *args):
+        self.conns[shard].send((name, args))
+
+    def _receive(self, shard):
+        ok, result = self.conns[shard].recv()
+        if not ok:
+            raise result
+        return result
+
+    def _call(self, shard, name, *args):
+        self._send(shard, name, *args)
+        return self._receive(shard)
+
+    # Sends one request per shard before waiting on any, so the shards work
+    # in parallel. requests maps shard -> args; the default is every shard.
+    def _fan_out(self, name, *args, requests=None):
+        if requests is None:
+            requests = {shard: args for shard in range(self.shards)}
+        for shard, shard_args in requests.items():
+            self._send(shard, name, *shard_args)
+        return {shard: self._receive(shard) for shard in requests}
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+            conn.close()
+        for worker in self.workers:
+            worker.join()
+        self.conns = []
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_dimension(self, dimension_name: str):
+        if not dimension_name:
+            print("Error: Dimension name cannot be empty")
+            return -1
+        if dimension_name in self.dimensions:
+            print(f"Error: Way '{dimension_name}' already exists")
+            return -1
+        self._fan_out("add_dimension", dimension_name)
+        self.dimensions.append(dimension_name)
+        return len(self.dimensions) - 1
+
+    def remove_dimension(self, dimension_name: str):
+        if dimension_name not in self.dimensions:
+            print(f"Error: Way '{dimension_name}' does not exist")
+            return False
+        if len(self.dimensions) <= 1:
+            print("Error: Cannot remove the last arrival way. At least one way must remain.")
+            return False
+        self._fan_out("remove_dimension", dimension_name)
+        self.dimensions.remove(dimension_name)
+        print(f"Successfully removed way '{dimension_name}'")
+        print(f"Remaining ways: {self.dimensions}")
+        return True
+
+    def mark_all_guests_as_old(self):
+        self._fan_out("mark_old")
+        self.epoch += 1
+
+    def calculate_room_numbers(self, matrix) -> list:
+        if self.room_scheme == "gamma":
+            return gamma_room_numbers(matrix)
+        return prime_power_room_numbers(matrix, PRIMES.first(len(self.dimensions)))
+
+    # Each round, every shard plans its guests in input order up to its
+    # first guest that overflows its segment, and only the guests before
+    # the earliest such guest anywhere are placed. That guest then moves on
+    # to the next segment, ahead of every later guest, so each overflow
+    # costs one more round. Rooms are returned in input order.
+    def add_rooms_bulk(self, values_list, is_initial=False):
+        matrix = as_matrix(values_list)
+        targets = list(self.calculate_room_numbers(matrix))
+        rows = matrix.tolist() if hasattr(matrix, 'tolist') else matrix
+        room_nums = [None] * len(rows)
+        pending = range(len(rows))
+        while pending:
+            requests = {}
+            positions = {}
+            for position in pending:
+                target = targets[position]
+                shard = self.partition.owner(target)
+                shard_rows, shard_targets, limits = requests.setdefault(shard, ([], [], {}))
+                shard_rows.append(rows[position])
+                shard_targets.append(target)
+                limits[target] = self.partition.end(target)
+                positions.setdefault(shard, []).append(position)
+
+            stop, limit = len(rows), None
+            for shard, (_, overflow) in self._fan_out("plan", requests=requests).items():
+                if overflow is not None and positions[shard][overflow[0]] < stop:
+                    stop, limit = positions[shard][overflow[0]], overflow[1]
+            commits = {shard: (bisect.bisect_left(shard_positions, stop), is_initial)
+                       for shard, shard_positions in positions.items()}
+            for shard, placed in self._fan_out("commit", requests=commits).items():
+                for position, room_num in zip(positions[shard], placed):
+                    room_nums[position] = room_num
+
+            if limit is not None:
+                targets[stop] = limit
+            pending = [position for position in pending if position >= stop]
+
+        if self.needs_bounds and room_nums:
+            self.rebalance()
+        return room_nums
+
+    def add_rooms_nested(self, counts):
+        return self.add_rooms_bulk(nested_matrix(counts))
+
+    def search(self, room_num):
+        return self._call(self.partition.owner(room_num), "search", room_num)
+
+    def delete(self, room_num):
+        return self._call(self.partition.owner(room_num), "delete", room_num)
+
+    def add_manual_room(self, room_num: int, replace=None):
+        if room_num < 0:
+            print("Error: Room number cannot be negative")
+            return False
+        owner = self.partition.owner(room_num)
+        if replace is None and self._call(owner, "occupied", room_num):
+            ans = input(f"Room number {room_num} is already occupied, do you want to replace?\n(1) Yes\n(2) No\nSelect Command : ")
+            if ans not in ('1', '2'):
+                print("Invalid Input")
+                return False
+            replace = ans == '1'
+        # The owner advances its own epoch as part of the manual add.
+        self._fan_out("mark_old", requests={shard: () for shard in range(self.shards) if shard != owner})
+        self.epoch += 1
+        return self._call(owner, "manual", room_num, bool(replace))
+
+    def epoch_status(self, epoch):
+        if self.epoch > 0 and epoch == self.epoch:
+            return 'new'
+        return 'old'
+
+    def status_of(self, details):
+        return self.epoch_status(details.get('epoch', 0))
+
+    def guest_count(self) -> int:
+        return sum(self._fan_out("count").values())
+
+    def guest_status_summary(self):
+        summaries = self._fan_out("summary").values()
+        return sum(old for old, _ in summaries), sum(new for _, new in summaries)
+
+    def shard_counts(self):
+        counts = self._fan_out("count")
+        return [counts[shard] for shard in range(self.shards)]
+
+    def track_by_dimension(self, dimension_name: str, value: int) -> list:
+        return self.track_range(dimension_name, value, value)
+
+    def track_range(self, dimension_name: str, lo: int, hi: int) -> list:
+        if dimension_name not in self.dimensions:
+            return []
+        return list(heapq.merge(*self._fan_out("track", dimension_name, lo, hi).values(), key=itemgetter(0)))
+
+    def sort(self):
+        return list(heapq.merge(*self._fan_out("sort").values()))
+
+    def rooms_between(self, lo, hi):
+        return list(heapq.merge(*self._fan_out("between", lo, hi).values()))
+
+    # Pulls page_size rows at a time from one shard, resuming after the
+    # last room it returned.
+    def _shard_rows(self, shard, page_size):
+        start = None
+        while True:
+            page = self._call(shard, "export_page", start, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            start = page[-1][0] + 1
+
+    def write_file(self, file_name: str, compress=None, chunk_size=10000):
+        rows = heapq.merge(*[self._shard_rows(shard, chunk_size) for shard in range(self.shards)],
+                           key=itemgetter(0))
+        return write_csv(file_name, self.dimensions, rows, compress, chunk_size)
+
+    def add_shard(self):
+        self._start_worker()
+        shard = self.shards - 1
+        for dimension_name in self.dimensions:
+            self._call(shard, "add_dimension", dimension_name)
+        self._call(shard, "set_epoch", self.epoch)
+        if isinstance(self.partition, BlockHashPartition):
+            return self.rebalance(BlockHashPartition(self.shards, self.partition.block_size))
+        return self.rebalance()
+
+    # Moves every room whose owner changes under the new partition. For
+    # range partitioning the default is a fresh set of bounds that splits
+    # the rooms evenly, estimated from rank samples of every shard.
+    def rebalance(self, partition=None, sample_size=1000):
+        if partition is None:
+            if isinstance(self.partition, BlockHashPartition):
+                partition = BlockHashPartition(self.shards, self.partition.block_size)
+            else:
+                partition = RangePartition(self._even_bounds(sample_size))
+        if partition.shards != self.shards:
+            raise ValueError(f"Partition has {partition.shards} shards, hotel has {self.shards}")
+
+        self.partition = partition
+        self.needs_bounds = False
+        moving = {}
+        for records in self._fan_out("extract", partition, requests={
+                shard: (partition, shard) for shard in range(self.shards)}).values():
+            for record in records:
+                moving.setdefault(partition.owner(record[0]), []).append(record)
+        self._fan_out("adopt", requests={shard: (records,) for shard, records in moving.items()})
+        return sum(len(records) for records in moving.values())
+
+    def _even_bounds(self, sample_size):
+        weighted = []
+        total = 0
+        for count, samples in self._fan_out("sample", sample_size).values():
+            total += count
+            if samples:
+                weighted.append([(room_num, count / len(samples)) for room_num in samples])
+        merged = list(heapq.merge(*weighted))
+        if not merged:
+            return [float("inf")] * (self.shards - 1)
+        bounds = []
+        seen = 0
+        shard = 1
+        for room_num, weight in merged:
+            while shard < self.shards and seen >= total * shard / self.shards:
+                bounds.append(room_num)
+                shard += 1
+            seen += weight
+        while len(bounds) < self.shards - 1:
+            bounds.append(merged[-1][0] + 1)
+        return bounds
@@ -0,0 +1,117 @@
+import mmap
+import os
+import struct
+from array import array
+
+MAGIC = b"HHSNAP"
+VERSION = 2
+PREFIX = struct.Struct("<6sH")
+HEADERS = {1: struct.Struct("<6sHQqBH"), 2: struct.Struct("<6sHQqBHQ")}
+LENGTH = struct.Struct("<H")
+ABSENT = -1
+
+
+# Layout, all little-endian and 8-byte aligned per section:
+#   header (magic, version, room count, epoch, fixed-width keys flag, way count,
+#           and since version 2 the journal generation the snapshot folds in)
+#   room scheme and way names as u16-length-prefixed UTF-8
+#   room keys ascending: int64s, or u64 offsets + byte blob for big keys
+#   epochs (int64), flags (uint8), then one int64 column per way (-1 = absent)
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
+
+
+def _write_text(f, text):
+    data = text.encode("utf-8")
+    f.write(LENGTH.pack(len(data)))
+    f.write(data)
+
+
+def write_snapshot(path, room_scheme, epoch, dimensions, keys, epochs, flags, columns, generation=0):
+    fixed = not keys or (keys[0] >= 0 and keys[-1] < 2 ** 63)
+    with open(path, "wb") as f:
+        f.write(HEADERS[VERSION].pack(MAGIC, VERSION, len(keys), epoch, 1 if fixed else 0, len(dimensions), generation))
+        _write_text(f, room_scheme)
+        for dimension_name in dimensions:
+            _write_text(f, dimension_name)
+        _pad(f)
+        if fixed:
+            f.write(array('q', keys).tobytes())
+        else:
+            blobs = [key.to_bytes((key.bit_length() + 7) // 8 or 1, "little") for key in keys]
+            offsets = array('Q', [0])
+            for blob in blobs:
+                offsets.append(offsets[-1] + len(blob))
+            f.write(offsets.tobytes())
+            f.write(b"".join(blobs))
+            _pad(f)
+        f.write(epochs.tobytes())
+        f.write(bytes(flags))
+        _pad(f)
+        for dimension_name in dimensions:
+            f.write(columns[dimension_name].tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Slicing past the end of the mapping silently comes up short, so every
+# section is checked against the file size before it is read.
+def _check(view, end):
+    if end > len(view):
+        raise ValueError("Snapshot is truncated")
+
+
+def _read_array(view, offset, typecode, n):
+    result = array(typecode)
+    end = offset + n * result.itemsize
+    _check(view, end)
+    result.frombytes(view[offset:end])
+    return result, end
+
+
+def read_snapshot(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            magic, version = PREFIX.unpack_from(view, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a hotel snapshot")
+            if version not in HEADERS:
+                raise ValueError(f"Unsupported snapshot version {version}")
+            header = HEADERS[version].unpack_from(view, 0)
+            n, epoch, fixed, n_dims = header[2:6]
+            generation = header[6] if version >= 2 else 0
+            offset = HEADERS[version].size
+            texts = []
+            for _ in range(n_dims + 1):
+                (length,) = LENGTH.unpack_from(view, offset)
+                offset += LENGTH.size
+                _check(view, offset + length)
+                texts.append(bytes(view[offset:offset + length]).decode("utf-8"))
+                offset += length
+            offset += -offset % 8
+            if fixed:
+                keys, offset = _read_array(view, offset, 'q', n)
+                keys = keys.tolist()
+            else:
+                offsets, offset = _read_array(view, offset, 'Q', n + 1)
+                _check(view, offset + offsets[-1])
+                blob = view[offset:offset + offsets[-1]]
+                keys = [int.from_bytes(blob[offsets[i]:offsets[i + 1]], "little") for i in range(n)]
+                blob.release()
+                offset += offsets[-1]
+                offset += -offset % 8
+            epochs, offset = _read_array(view, offset, 'q', n)
+            _check(view, offset + n)
+            flags = bytearray(view[offset:offset + n])
+            offset += n
+            offset += -offset % 8
+            columns = {}
+            for dimension_name in texts[1:]:
+                columns[dimension_name], offset = _read_array(view, offset, 'q', n)
+        finally:
+            view.release()
+    return {
+        "room_scheme": texts[0], "epoch": epoch, "dimensions": texts[1:], "generation": generation,
+        "keys": keys, "epochs": epochs, "flags": flags, "columns": columns,
+    }
@@ -1,19 +1,171 @@
+from array import array
+import heapq
 import random
 
-class Treap:
+
+class OrderedQueries:
+    # Order-statistic and range queries shared by both treaps. Subclasses
+    # provide the node accessors and keep node sizes up to date.
+    def __len__(self):
+        return self._size(self.root)
+
+    def min(self):
+        node = self.root
+        if node == self.nil:
+            return None
+        while self._left(node) != self.nil:
+            node = self._left(node)
+        return self._key(node)
+
+    def max(self):
+        node = self.root
+        if node == self.nil:
+            return None
+        while self._right(node) != self.nil:
+            node = self._right(node)
+        return self._key(node)
+
+    def contains(self, data):
+        node = self.root
+        while node != self.nil:
+            key = self._key(node)
+            if data < key:
+                node = self._left(node)
+            elif data > key:
+                node = self._right(node)
+            else:
+                return True
+        return False
+
+    def rank(self, data):
+        count = 0
+        node = self.root
+        while node != self.nil:
+            if self._key(node) < data:
+                count += self._size(self._left(node)) + 1
+                node = self._right(node)
+            else:
+                node = self._left(node)
+        return count
+
+    def select(self, k):
+        if k < 0 or k >= len(self):
+            return None
+        node = self.root
+        while True:
+            left_size = self._size(self._left(node))
+            if k < left_size:
+                node = self._left(node)
+            elif k > left_size:
+                k -= left_size + 1
+                node = self._right(node)
+            else:
+                return self._key(node)
+
+    def depth(self, data):
+        depth = 0
+        node = self.root
+        while node != self.nil:
+            depth += 1
+            key = self._key(node)
+            if data < key:
+                node = self._left(node)
+            elif data > key:
+                node = self._right(node)
+            else:
+                return depth
+        return None
+
+    def successor(self, data):
+        result = None
+        node = self.root
+        while node != self.nil:
+            if self._key(node) > data:
+                result = self._key(node)
+                node = self._left(node)
+            else:
+                node = self._right(node)
+        return result
+
+    def predecessor(self, data):
+        result = None
+        node = self.root
+        while node != self.nil:
+            if self._key(node) < data:
+                result = self._key(node)
+                node = self._right(node)
+            else:
+                node = self._left(node)
+        return result
+
+    def iter_from(self, lo=None):
+        stack = []
+        node = self.root
+        while node != self.nil:
+            if lo is None or self._key(node) >= lo:
+                stack.append(node)
+                node = self._left(node)
+            else:
+                node = self._right(node)
+        while stack:
+            node = stack.pop()
+            yield self._key(node)
+            node = self._right(node)
+            while node != self.nil:
+                stack.append(node)
+                node = self._left(node)
+
+    def range(self, lo, hi):
+        result = []
+        for key in self.iter_from(lo):
+            if key > hi:
+                break
+            result.append(key)
+        return result
+
+    def pages(self, page_size, lo=None):
+        page = []
+        for key in self.iter_from(lo):
+            page.append(key)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+
+class Treap(OrderedQueries):
     class Node:
         def __init__(self, data):
             self.data = data
             self.priority = random.random()
             self.left = None
             self.right = None
+            self.size = 1
 
         def __str__(self):
             return f"{self.data}({self.priority:.3f})"
 
+    nil = None
+
     def __init__(self):
         self.root = None
 
+    def _key(self, node):
+        return node.data
+
+    def _left(self, node):
+        return node.left
+
+    def _right(self, node):
+        return node.right
+
+    def _size(self, node):
+        return node.size if node else 0
+
+    def _update(self, node):
+        node.size = 1 + (node.left.size if node.left else 0) + (node.right.size if node.right else 0)
+
     def add(self, data):
         self.root = self._add(self.root, data)
         return self.root
@@ -23,14 +175,38 @@ class Treap:
             return self.Node(data)
         if data < root.data:
             root.left = self._add(root.left, data)
+            self._update(root)
             if root.left.priority > root.priority:
                 root = self._rotateRight(root)
         elif data > root.data:
             root.right = self._add(root.right, data)
+            self._update(root)
             if root.right.priority > root.priority:
                 root = self._rotateLeft(root)
         return root
 
+    def add_sorted(self, keys):
+        if self.root is None:
+            return self.build_from_sorted(keys)
+        return self.build_from_sorted(heapq.merge(self.InOrder(), keys))
+
+    def build_from_sorted(self, keys):
+        stack = []
+        for key in keys:
+            node = self.Node(key)
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+                self._update(last)
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        for node in reversed(stack):
+            self._update(node)
+        self.root = stack[0] if stack else None
+        return self.root
+
     def delete(self, data):
         self.root, deleted = self._delete(self.root, data)
         return deleted
@@ -64,18 +240,23 @@ class Treap:
                 else:
                     root = self._rotateLeft(root)
                     root.left, _ = self._delete(root.left, data)
+        self._update(root)
         return root, deleted
 
     def _rotateRight(self, y):
         x = y.left
         y.left = x.right
         x.right = y
+        self._update(y)
+        self._update(x)
         return x
 
     def _rotateLeft(self, x):
         y = x.right
         x.right = y.left
         y.left = x
+        self._update(x)
+        self._update(y)
         return y
 
     def InOrder(self):
@@ -93,4 +274,312 @@ class Treap:
         if node:
             self._inorder(node.left, result)
             result.append(node.data)
-            self._inorder(node.right, result)
\ No newline at end of file
+            self._inorder(node.right, result)
+
+
+# Add and delete copy the nodes on the search path instead of changing
+# them, so every old root stays a complete tree that never changes again.
+# frozen() hands one out in O(1); nodes that no root reaches any more are
+# freed by reference counting.
+class PersistentTreap(Treap):
+    class Node:
+        __slots__ = ("data", "priority", "left", "right", "size")
+
+        def __init__(self, data, priority=None, left=None, right=None):
+            self.data = data
+            self.priority = random.random() if priority is None else priority
+            self.left = left
+            self.right = right
+            self.size = 1 + (left.size if left else 0) + (right.size if right else 0)
+
+    def frozen(self):
+        view = PersistentTreap.__new__(PersistentTreap)
+        view.root = self.root
+        return view
+
+    def _copy(self, node, left, right):
+        return self.Node(node.data, node.priority, left, right)
+
+    def _split(self, node, data):
+        if node is None:
+            return None, None
+        if node.data < data:
+            left, right = self._split(node.right, data)
+            return self._copy(node, node.left, left), right
+        left, right = self._split(node.left, data)
+        return left, self._copy(node, right, node.right)
+
+    def _merge(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        if a.priority > b.priority:
+            return self._copy(a, a.left, self._merge(a.right, b))
+        return self._copy(b, self._merge(a, b.left), b.right)
+
+    def add(self, data):
+        if not self.contains(data):
+            self.root = self._insert(self.root, self.Node(data))
+        return self.root
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.priority > node.priority:
+            left, right = self._split(node, new.data)
+            return self.Node(new.data, new.priority, left, right)
+        if new.data < node.data:
+            return self._copy(node, self._insert(node.left, new), node.right)
+        return self._copy(node, node.left, self._insert(node.right, new))
+
+    def delete(self, data):
+        if not self.contains(data):
+            return False
+        self.root = self._remove(self.root, data)
+        return True
+
+    def _remove(self, node, data):
+        if data < node.data:
+            return self._copy(node, self._remove(node.left, data), node.right)
+        if data > node.data:
+            return self._copy(node, node.left, self._remove(node.right, data))
+        return self._merge(node.left, node.right)
+
+
+NIL = -1
+
+
+class ArrayTreap(OrderedQueries):
+    nil = NIL
+
+    def __init__(self):
+        self.root = NIL
+        self.keys = []
+        self.priority = array('d')
+        self.left = array('l')
+        self.right = array('l')
+        self.size = array('l')
+        self.free = []
+
+    def _key(self, node):
+        return self.keys[node]
+
+    def _left(self, node):
+        return self.left[node]
+
+    def _right(self, node):
+        return self.right[node]
+
+    def _size(self, node):
+        return self.size[node] if node != NIL else 0
+
+    def _update(self, node):
+        left, right, size = self.left[node], self.right[node], self.size
+        size[node] = 1 + (size[left] if left != NIL else 0) + (size[right] if right != NIL else 0)
+
+    def new_node(self, data):
+        if self.free:
+            node = self.free.pop()
+            self.keys[node] = data
+            self.priority[node] = random.random()
+            self.left[node] = NIL
+            self.right[node] = NIL
+            self.size[node] = 1
+            return node
+        self.keys.append(data)
+        self.priority.append(random.random())
+        self.left.append(NIL)
+        self.right.append(NIL)
+        self.size.append(1)
+        return len(self.keys) - 1
+
+    def find(self, data):
+        keys, left, right = self.keys, self.left, self.right
+        node = self.root
+        while node != NIL:
+            key = keys[node]
+            if data < key:
+                node = left[node]
+            elif data > key:
+                node = right[node]
+            else:
+                return node
+        return NIL
+
+    def _split(self, node, data):
+        keys, left, right = self.keys, self.left, self.right
+        left_root = right_root = NIL
+        left_tail = right_tail = NIL
+        path = []
+        while node != NIL:
+            path.append(node)
+            if keys[node] < data:
+                if left_tail == NIL:
+                    left_root = node
+                else:
+                    right[left_tail] = node
+                left_tail = node
+                node = right[node]
+            else:
+                if right_tail == NIL:
+                    right_root = node
+                else:
+                    left[right_tail] = node
+                right_tail = node
+                node = left[node]
+        if left_tail != NIL:
+            right[left_tail] = NIL
+        if right_tail != NIL:
+            left[right_tail] = NIL
+        for node in reversed(path):
+            self._update(node)
+        return left_root, right_root
+
+    def _merge(self, a, b):
+        priority, left, right = self.priority, self.left, self.right
+        root = tail = NIL
+        tail_is_left = False
+        path = []
+        while a != NIL and b != NIL:
+            if priority[a] > priority[b]:
+                node, a = a, right[a]
+                next_is_left = False
+            else:
+                node, b = b, left[b]
+                next_is_left = True
+            if tail == NIL:
+                root = node
+            elif tail_is_left:
+                left[tail] = node
+            else:
+                right[tail] = node
+            tail, tail_is_left = node, next_is_left
+            path.append(node)
+        rest = a if a != NIL else b
+        if tail == NIL:
+            root = rest
+        elif tail_is_left:
+            left[tail] = rest
+        else:
+            right[tail] = rest
+        for node in reversed(path):
+            self._update(node)
+        return root
+
+    def _link(self, parent, parent_is_left, node):
+        if parent == NIL:
+            self.root = node
+        elif parent_is_left:
+            self.left[parent] = node
+        else:
+            self.right[parent] = node
+
+    def add(self, data):
+        if self.find(data) != NIL:
+            return self.root
+        node = self.new_node(data)
+        keys, priority, left, right, size = self.keys, self.priority, self.left, self.right, self.size
+        parent = NIL
+        parent_is_left = False
+        current = self.root
+        while current != NIL and priority[current] > priority[node]:
+            size[current] += 1
+            parent = current
+            parent_is_left = data < keys[current]
+            current = left[current] if parent_is_left else right[current]
+        left[node], right[node] = self._split(current, data)
+        self._update(node)
+        self._link(parent, parent_is_left, node)
+        return self.root
+
+    def delete(self, data):
+        if self.find(data) == NIL:
+            return False
+        keys, left, right, size = self.keys, self.left, self.right, self.size
+        parent = NIL
+        parent_is_left = False
+        node = self.root
+        while keys[node] != data:
+            size[node] -= 1
+            parent = node
+            parent_is_left = data < keys[node]
+            node = left[node] if parent_is_left else right[node]
+        self._link(parent, parent_is_left, self._merge(left[node], right[node]))
+        keys[node] = None
+        self.free.append(node)
+        return True
+
+    def delete_node(self, data):
+        return self.delete(data)
+
+    def split(self, data):
+        upper = ArrayTreap.__new__(ArrayTreap)
+        upper.keys, upper.priority, upper.size = self.keys, self.priority, self.size
+        upper.left, upper.right, upper.free = self.left, self.right, self.free
+        self.root, upper.root = self._split(self.root, data)
+        return upper
+
+    def merge(self, other):
+        if other.root == NIL:
+            return self.root
+        if self.root != NIL and self.max() >= other.min():
+            raise ValueError("merge requires every key of other to be greater than this treap's keys")
+        # Either way other is left empty, as its keys now belong to self.
+        if other.keys is self.keys:
+            self.root = self._merge(self.root, other.root)
+        else:
+            self.add_sorted(other.InOrder())
+        other.root = NIL
+        return self.root
+
+    def add_sorted(self, keys):
+        if self.root == NIL:
+            return self.build_from_sorted(keys)
+        return self.build_from_sorted(heapq.merge(self.InOrder(), keys))
+
+    def build_from_sorted(self, keys):
+        self.keys = list(keys)
+        n = len(self.keys)
+        self.priority = array('d', [random.random() for _ in range(n)])
+        self.left = array('l', [NIL]) * n
+        self.right = array('l', [NIL]) * n
+        self.size = array('l', [1]) * n
+        self.free = []
+        priority, left, right = self.priority, self.left, self.right
+        stack = []
+        for node in range(n):
+            last = NIL
+            while stack and priority[stack[-1]] < priority[node]:
+                last = stack.pop()
+                self._update(last)
+            left[node] = last
+            if stack:
+                right[stack[-1]] = node
+            stack.append(node)
+        for node in reversed(stack):
+            self._update(node)
+        self.root = stack[0] if stack else NIL
+        return self.root
+
+    def InOrder(self):
+        keys, left, right = self.keys, self.left, self.right
+        result = []
+        stack = []
+        node = self.root
+        while stack or node != NIL:
+            while node != NIL:
+                stack.append(node)
+                node = left[node]
+            node = stack.pop()
+            result.append(keys[node])
+            node = right[node]
+        return result
+
+    def inorder(self):
+        result = self.InOrder()
+        print(result)
+        return result
+
+
+TREAP_TYPES = {"node": Treap, "array": ArrayTreap, "persistent": PersistentTreap}
@@ -0,0 +1,63 @@
+import threading
+
+
+# Hands out read versions for snapshots. pin() is called on the writing
+# thread; every write after it carries a higher version, so a structure
+# only has to keep what it overwrites while some reader is pinned below
+# the current version. release() may come from any thread; it only marks
+# the clock stale, and the writer drops the kept history on its next
+# write once no reader is left.
+class VersionClock:
+    def __init__(self):
+        self.version = 0
+        self.readers = {}
+        self.oldest = None
+        self.stale = False
+        self.lock = threading.Lock()
+
+    def pin(self):
+        with self.lock:
+            version = self.version
+            self.readers[version] = self.readers.get(version, 0) + 1
+            if self.oldest is None:
+                self.oldest = version
+            self.version += 1
+            return version
+
+    def release(self, version):
+        with self.lock:
+            count = self.readers.pop(version)
+            if count > 1:
+                self.readers[version] = count - 1
+            elif version == self.oldest:
+                self.oldest = min(self.readers) if self.readers else None
+            if not self.readers:
+                self.stale = True
+
+    # Keeps old, what slot held before the write about to happen, for the
+    # readers pinned before it. Returns True when this is the slot's first
+    # write in the current version: the live object may then still be
+    # shared with a reader and has to be copied rather than changed.
+    def save(self, history, slot, old):
+        entries = history.get(slot)
+        if entries is None:
+            history[slot] = [(self.version, old)]
+            return True
+        if entries[-1][0] == self.version:
+            return False
+        oldest = self.oldest
+        history[slot] = [entry for entry in entries if oldest is not None and entry[0] > oldest] + [
+            (self.version, old)]
+        return True
+
+
+# What slot held at version: the first thing overwritten after it, or the
+# live value when nothing was. The live value has to be read before the
+# history, since a write in between moves it into the history.
+def read_version(history, slot, version, live):
+    entries = history.get(slot)
+    if entries:
+        for replaced, old in entries:
+            if replaced > version:
+                return old
+    return live
@@ -0,0 +1,486 @@
+import argparse
+import contextlib
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from HashMap import HashTable, TABLE_TYPES
+from Hotel import Hotel
+from ParallelArrival import parallel_nested_arrival
+from Primes import PRIMES
+from RoomStore import STORE_TYPES
+import RoomNumber
+from RoomNumber import (prime_power_room_number, gamma_room_number, prime_power_room_numbers, gamma_room_numbers,
+                        initial_matrix)
+from Treap import Treap, TREAP_TYPES
+
+
+def nested_values(counts):
+    return [list(combo) for combo in itertools.product(*[range(1, c + 1) for c in counts])]
+
+
+def bench_room_numbers(counts):
+    values_list = nested_values(counts)
+    primes = PRIMES.first(len(counts))
+    schemes = [
+        ("prime", lambda values: prime_power_room_number(values, primes)),
+        ("gamma", gamma_room_number),
+    ]
+    print(f"\n=== Room numbers for {' x '.join(map(str, counts))} = {len(values_list)} guests ===")
+    for name, encode in schemes:
+        start = time.perf_counter()
+        keys = [encode(values) for values in values_list]
+        encode_time = time.perf_counter() - start
+
+        table = HashTable()
+        start = time.perf_counter()
+        for key in keys:
+            table.insert(key, None)
+        for key in keys:
+            table.search(key)
+        hash_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        Treap().build_from_sorted(sorted(keys))
+        treap_time = time.perf_counter() - start
+
+        max_bits = max(key.bit_length() for key in keys)
+        print(f"{name:>6}: encode {encode_time:.4f}s  hash {hash_time:.4f}s  "
+              f"treap {treap_time:.4f}s  max key {max_bits} bits  unique {len(set(keys)) == len(keys)}")
+
+
+def bench_tables(counts):
+    primes = PRIMES.first(len(counts))
+    keys = [prime_power_room_number(values, primes) for values in nested_values(counts)]
+    print(f"\n=== Hash tables with {len(keys)} prime-power keys ===")
+    for name, table_type in TABLE_TYPES.items():
+        tracemalloc.start()
+        table = table_type()
+        for key in keys:
+            table.insert(key, None)
+        memory, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        table = table_type()
+        start = time.perf_counter()
+        for key in keys:
+            table.insert(key, None)
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in keys:
+            table.search(key)
+        for key in keys:
+            table.search(key + 1)
+        search_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in keys:
+            table.remove(key)
+        remove_time = time.perf_counter() - start
+
+        print(f"{name:>8}: insert {len(keys) / insert_time:,.0f}/s  search {2 * len(keys) / search_time:,.0f}/s  "
+              f"remove {len(keys) / remove_time:,.0f}/s  memory {memory / 2**20:.1f} MiB  peak {peak / 2**20:.1f} MiB")
+
+
+def latency_histogram(samples_ns):
+    histogram = {}
+    for sample in samples_ns:
+        bucket = max(sample // 1000, 1).bit_length() - 1
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    return histogram
+
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(int(len(sorted_samples) * fraction), len(sorted_samples) - 1)]
+
+
+def bench_insert_latency(n):
+    print(f"\n=== Per-insert latency over {n} inserts ===")
+    for name in ("chained", "incremental"):
+        table = TABLE_TYPES[name]()
+        samples = []
+        clock = time.perf_counter_ns
+        # Cyclic GC pauses would otherwise dominate the tail for both tables.
+        gc.disable()
+        for key in range(n):
+            start = clock()
+            table.insert(key * 7919, None)
+            samples.append(clock() - start)
+        gc.enable()
+        ordered = sorted(samples)
+        print(f"{name:>11}: p50 {percentile(ordered, 0.5) / 1000:.1f}us  p99 {percentile(ordered, 0.99) / 1000:.1f}us  "
+              f"p99.9 {percentile(ordered, 0.999) / 1000:.1f}us  max {ordered[-1] / 1000:.1f}us")
+        for bucket, hits in sorted(latency_histogram(samples).items()):
+            low = 0 if bucket == 0 else 2 ** bucket
+            print(f"{'':>13}{low:>8}-{2 ** (bucket + 1)}us: {hits}")
+
+
+def bench_treaps(n):
+    keys = list(range(0, n * 3, 3))
+    shuffled = keys[:]
+    random.shuffle(shuffled)
+    print(f"\n=== Treaps with {n} keys ===")
+    for name, treap_type in TREAP_TYPES.items():
+        tracemalloc.start()
+        treap = treap_type()
+        treap.build_from_sorted(keys)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        treap = treap_type()
+        start = time.perf_counter()
+        treap.build_from_sorted(keys)
+        build_time = time.perf_counter() - start
+
+        treap = treap_type()
+        start = time.perf_counter()
+        for key in shuffled:
+            treap.add(key)
+        add_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in shuffled:
+            treap.delete(key)
+        delete_time = time.perf_counter() - start
+
+        print(f"{name:>6}: build {build_time:.3f}s  add {n / add_time:,.0f}/s  "
+              f"delete {n / delete_time:,.0f}/s  memory {memory / 2**20:.1f} MiB")
+
+
+def bench_room_storage(counts):
+    dimensions = [f"way{i}" for i in range(len(counts))]
+    values_list = nested_values(counts)
+    print(f"\n=== Room details for {len(values_list)} guests over {len(counts)} ways ===")
+    for name, store_type in STORE_TYPES.items():
+        tracemalloc.start()
+        store = store_type()
+        for dimension in dimensions:
+            store.add_column(dimension, [])
+        handles = [store.add(dimensions, values, 0) for values in values_list]
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        store.add_column("extra", handles)
+        store.drop_column("extra", handles)
+        column_time = time.perf_counter() - start
+        print(f"{name:>9}: memory {memory / 2**20:.1f} MiB  add+drop way {column_time:.4f}s")
+
+
+def bench_vectorized_room_numbers(n, ways=3, max_value=20):
+    print(f"\n=== Batched room numbers for {n} guests over {ways} ways (values <= {max_value}) ===")
+    np = RoomNumber.load_numpy()
+    if np is None:
+        print("NumPy is not installed, skipping")
+        return
+    matrix = np.random.default_rng(0).integers(0, max_value + 1, size=(n, ways))
+    rows = matrix.tolist()
+    primes = PRIMES.first(ways)
+    schemes = [
+        ("prime", lambda values: prime_power_room_number(values, primes), lambda m: prime_power_room_numbers(m, primes)),
+        ("gamma", gamma_room_number, gamma_room_numbers),
+    ]
+    for name, encode, encode_batch in schemes:
+        start = time.perf_counter()
+        expected = [encode(values) for values in rows]
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        room_nums = encode_batch(matrix)
+        batch_time = time.perf_counter() - start
+
+        print(f"{name:>6}: python loop {loop_time:.3f}s  batched {batch_time:.3f}s  "
+              f"speedup {loop_time / batch_time:.1f}x  same {room_nums == expected}")
+
+
+def bench_parallel_arrival(counts, scheme="prime"):
+    total = 1
+    for c in counts:
+        total *= c
+    primes = PRIMES.first(len(counts))[:len(counts)]
+    spec = HashTable(total * 2).prehash_spec()
+    print(f"\n=== Nested arrival room numbers for {total} guests ({scheme}) ===")
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        if workers == 1:
+            arrivals = sum(1 for _ in parallel_nested_arrival(counts, scheme, primes, spec, 1, chunk_size=total))
+        else:
+            arrivals = sum(1 for _ in parallel_nested_arrival(counts, scheme, primes, spec, workers))
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>3} worker(s): {elapsed:.3f}s  {arrivals / elapsed:,.0f} guests/s")
+
+
+def run_micro_benchmarks():
+    bench_room_numbers([1000, 10])
+    bench_room_numbers([100, 100, 10])
+    bench_room_numbers([20, 20, 20, 20])
+    bench_room_numbers([8, 8, 8, 8, 8, 8])
+    bench_tables([100, 100, 10])
+    bench_tables([20, 20, 20, 20])
+    bench_insert_latency(1000000)
+    bench_treaps(200000)
+    bench_room_storage([100, 100, 10])
+    for n in (10 ** 5, 10 ** 6, 10 ** 7):
+        bench_vectorized_room_numbers(n)
+    bench_parallel_arrival([200, 200, 50])
+
+
+# Scripted workloads for regression tracking. Each workload builds its
+# state untimed and returns the operations to time as (function, args)
+# pairs together with how many guests or rooms those operations handle.
+def hotel_with_ways(config, ways):
+    hotel = Hotel(**config)
+    for i in range(ways):
+        hotel.add_dimension(f"way{i}")
+    return hotel
+
+
+def random_rows(n, ways, max_value=20, seed=0):
+    rng = random.Random(seed)
+    return [[rng.randint(0, max_value) for _ in range(ways)] for _ in range(n)]
+
+
+def workload_initial(config, n):
+    hotel = hotel_with_ways(config, 3)
+    return [(hotel.add_rooms_bulk, (initial_matrix(n, 3), True))], n
+
+
+def nested_workload(ways):
+    def workload(config, n):
+        hotel = hotel_with_ways(config, ways)
+        counts = [max(2, round(n ** (1 / ways)))] * ways
+        total = 1
+        for c in counts:
+            total *= c
+        return [(hotel.add_rooms_nested, (counts,))], total
+    return workload
+
+
+def workload_manual_collisions(config, n):
+    hotel = hotel_with_ways(config, 3)
+    hotel.add_rooms_bulk(random_rows(n, 3, seed=1))
+    arrivals = random_rows(n, 3, seed=2)
+    occupied = hotel.treap.InOrder()
+    rng = random.Random(3)
+    ops = [(hotel.add_manual_room, (room_num, True)) for room_num in rng.sample(occupied, n // 10)]
+    ops += [(hotel.add_manual_room, (hotel.calculate_room_number(values), True)) for values in arrivals[:n // 10]]
+    ops += [(hotel.add_room, (values,)) for values in arrivals]
+    return ops, len(ops)
+
+
+def workload_churn(config, n):
+    hotel = hotel_with_ways(config, 3)
+    hotel.add_rooms_bulk(random_rows(n, 3, seed=1))
+    rng = random.Random(4)
+    rooms = hotel.treap.InOrder()
+    ops = []
+    for values in random_rows(n, 3, seed=5):
+        if rng.random() < 0.5:
+            ops.append((hotel.add_room, (values,)))
+        else:
+            i = rng.randrange(len(rooms))
+            rooms[i], rooms[-1] = rooms[-1], rooms[i]
+            ops.append((hotel.delete, (rooms.pop(),)))
+    return ops, len(ops)
+
+
+def workload_tracking(config, n):
+    hotel = hotel_with_ways(config, 3)
+    hotel.add_rooms_bulk(random_rows(n, 3, seed=1))
+    rng = random.Random(6)
+    ops = []
+    for _ in range(300):
+        lo = rng.randint(0, 20)
+        ops.append((hotel.track_by_dimension, ("way0", lo)))
+        ops.append((hotel.track_range, ("way1", lo, lo + 2)))
+        ops.append((hotel.track_where, ({"way0": lo, "way2": (lo, lo + 5)},)))
+    return ops, len(ops)
+
+
+def workload_export(config, n, directory):
+    hotel = hotel_with_ways(config, 3)
+    hotel.add_rooms_bulk(random_rows(n, 3, seed=1))
+    return [(hotel.write_file, (os.path.join(directory, "hotel.csv"),))], n
+
+
+def workload_snapshot(config, n, directory):
+    hotel = hotel_with_ways(config, 3)
+    hotel.add_rooms_bulk(random_rows(n, 3, seed=1))
+    path = os.path.join(directory, "hotel.snap")
+    restored = Hotel(**config)
+    return [(hotel.save_snapshot, (path,)), (restored.load_snapshot, (path,))], 2 * n
+
+
+def workload_hash_table(config, n):
+    table = TABLE_TYPES[config["table"]](bloom=config["bloom"])
+    rng = random.Random(7)
+    keys = [rng.getrandbits(96) for _ in range(n)]
+    ops = [(table.insert, (key, None)) for key in keys]
+    ops += [(table.search, (key,)) for key in keys]
+    ops += [(table.remove, (key,)) for key in keys]
+    return ops, len(ops)
+
+
+# Lookups of big prime-power room numbers, nine in ten of them free: the
+# misses a membership filter is meant to cut short.
+def workload_lookup_misses(config, n):
+    hotel = hotel_with_ways(config, 3)
+    hotel.add_rooms_bulk(random_rows(n, 3, seed=1))
+    rng = random.Random(9)
+    probes = [2 ** rng.randint(64, 4096) * 3 ** rng.randint(0, 64) for _ in range(n)]
+    probes[::10] = hotel.treap.InOrder()[:len(probes[::10])]
+    return [(hotel.hash.search, (room_num,)) for room_num in probes], n
+
+
+def workload_treap(config, n):
+    treap = TREAP_TYPES[config["treap"]]()
+    keys = list(range(0, n * 3, 3))
+    random.Random(8).shuffle(keys)
+    ops = [(treap.add, (key,)) for key in keys]
+    ops += [(treap.range, (key, key + 30)) for key in keys[:n // 10]]
+    ops += [(treap.delete, (key,)) for key in keys]
+    return ops, len(ops)
+
+
+WORKLOADS = {
+    "initial": workload_initial,
+    **{f"nested-{ways}": nested_workload(ways) for ways in range(1, 7)},
+    "manual-collisions": workload_manual_collisions,
+    "churn": workload_churn,
+    "tracking": workload_tracking,
+    "export": workload_export,
+    "snapshot": workload_snapshot,
+    "hash-table": workload_hash_table,
+    "lookup-misses": workload_lookup_misses,
+    "treap": workload_treap,
+}
+FILE_WORKLOADS = {"export", "snapshot"}
+
+
+def prepare(name, config, n, directory):
+    if name in FILE_WORKLOADS:
+        return WORKLOADS[name](config, n, directory)
+    return WORKLOADS[name](config, n)
+
+
+def time_ops(ops):
+    clock = time.perf_counter_ns
+    samples = []
+    start = clock()
+    for func, args in ops:
+        op_start = clock()
+        func(*args)
+        samples.append(clock() - op_start)
+    return clock() - start, samples
+
+
+# Timing and peak memory come from separate runs because tracemalloc slows
+# every allocation down.
+def run_workload(name, config, n, memory=True):
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as sink:
+        with contextlib.redirect_stdout(sink):
+            ops, items = prepare(name, config, n, directory)
+            gc.collect()
+            elapsed_ns, samples = time_ops(ops)
+            peak = None
+            if memory:
+                ops, items = prepare(name, config, n, directory)
+                gc.collect()
+                tracemalloc.start()
+                time_ops(ops)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+    ordered = sorted(samples)
+    seconds = elapsed_ns / 1e9
+    return {
+        "workload": name, "size": n, "config": config,
+        "ops": len(ops), "items": items, "seconds": seconds,
+        "items_per_sec": items / seconds if seconds else None,
+        "latency_us": {label: percentile(ordered, fraction) / 1000
+                       for label, fraction in (("p50", 0.5), ("p99", 0.99), ("p99.9", 0.999), ("max", 1.0))},
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_suite(sizes, config, workloads=None, memory=True):
+    results = []
+    for n in sizes:
+        for name in workloads or WORKLOADS:
+            result = run_workload(name, config, n, memory)
+            print(f"{name:>17} n={n:<8} {result['items_per_sec']:>14,.0f} items/s  "
+                  f"p99 {result['latency_us']['p99']:>10.1f}us", file=sys.stderr)
+            results.append(result)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+
+# Reports every workload whose throughput dropped by more than tolerance
+# against a baseline produced by run_suite.
+def compare_results(baseline, current, tolerance=0.1):
+    def key(result):
+        return result["workload"], result["size"], tuple(sorted(result["config"].items()))
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(key(result))
+        if old is None or not old["items_per_sec"] or not result["items_per_sec"]:
+            continue
+        change = result["items_per_sec"] / old["items_per_sec"] - 1
+        if change < -tolerance:
+            regressions.append({"workload": result["workload"], "size": result["size"], "change": change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hotel benchmarks")
+    parser.add_argument("mode", nargs="?", choices=("micro", "suite"), default="micro")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--workloads", nargs="+", choices=tuple(WORKLOADS))
+    parser.add_argument("--table", choices=tuple(TABLE_TYPES), default="chained")
+    parser.add_argument("--treap", choices=tuple(TREAP_TYPES), default="node")
+    parser.add_argument("--storage", choices=tuple(STORE_TYPES), default="dict")
+    parser.add_argument("--bloom", action="store_true", help="put a Bloom filter in front of the hash table")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON to check for throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.mode == "micro":
+        run_micro_benchmarks()
+        return 0
+
+    config = {"table": args.table, "treap": args.treap, "storage": args.storage, "bloom": args.bloom}
+    report = run_suite(args.sizes, config, args.workloads, not args.no_memory)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['workload']} n={regression['size']} "
+                  f"{regression['change']:+.1%} items/s", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
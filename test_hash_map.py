@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from HashMap import TABLE_TYPES, CountingBloomFilter
+from Hotel import Hotel
+from Primes import PRIMES
+from RoomNumber import prime_power_room_numbers
+
+
+def prime_power_keys(n, seed=0):
+    rng = random.Random(seed)
+    rows = [[rng.randint(0, 25) for _ in range(4)] for _ in range(n * 2)]
+    keys = sorted(set(prime_power_room_numbers(rows, PRIMES.first(4))))
+    rng.shuffle(keys)
+    return keys
+
+
+# Prime-power room numbers are mostly even; the filter must not lose the
+# trailing-zero bits of its index to them.
+def test_bloom_false_positive_rate_on_prime_power_keys():
+    keys = prime_power_keys(40000)
+    present, absent = keys[:7000], keys[7000:]
+    bloom = CountingBloomFilter(len(present), false_positive_rate=0.001)
+    for key in present:
+        bloom.add(key)
+    assert all(bloom.might_contain(key) for key in present)
+    assert sum(bloom.might_contain(key) for key in absent) / len(absent) < 0.004
+
+
+@pytest.mark.parametrize("table", list(TABLE_TYPES))
+def test_bloom_counts_survive_resize(table):
+    hash_table = TABLE_TYPES[table](8, bloom=True)
+    keys = prime_power_keys(3000, seed=1)
+    present, absent = keys[:2000], keys[2000:]
+    lookups = 0
+    for i, key in enumerate(present):
+        hash_table.insert(key, i)
+        assert hash_table.search(absent[i % len(absent)]) is None
+        lookups += 1
+    counts = hash_table.bloom_counts()
+    assert counts["rejected"] + counts["false_positives"] == lookups
+    assert counts["rejected"] > lookups * 0.9
+
+
+def test_bloom_counts_export_as_counters():
+    hotel = Hotel(bloom=True)
+    hotel.add_dimension("a")
+    hotel.add_rooms_bulk([[i] for i in range(50)])
+    for room_num in range(10 ** 6, 10 ** 6 + 100):
+        hotel.search(room_num)
+    text = hotel.metrics.prometheus()
+    assert "# TYPE hotel_bloom_rejected_total counter" in text
+    assert "# TYPE hotel_bloom_false_positives_total counter" in text
+    assert "# TYPE hotel_bloom_false_positive_rate gauge" in text
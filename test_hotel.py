@@ -0,0 +1,210 @@
+import bisect
+import os
+import random
+import stat
+
+import pytest
+
+from Hotel import Hotel
+
+CONFIGS = [
+    dict(table="chained", treap="node", storage="dict"),
+    dict(table="incremental", treap="array", storage="columnar"),
+    dict(table="open", treap="node", storage="columnar"),
+    dict(table="chained", treap="persistent", storage="dict"),
+]
+
+
+def random_rows(rng, n, ways, max_value=6):
+    return [[rng.randint(0, max_value) for _ in range(ways)] for _ in range(n)]
+
+
+# Arrivals, departures, manual rooms, status changes and way changes in one
+# random sequence, so every counter is moved in both directions.
+def mixed_operations(hotel, rng, rounds=6):
+    for way in ("a", "b"):
+        hotel.add_dimension(way)
+    hotel.add_rooms_bulk(random_rows(rng, 200, 2), is_initial=True)
+    for i in range(rounds):
+        hotel.mark_all_guests_as_old()
+        hotel.add_rooms_bulk(random_rows(rng, 80, len(hotel.dimensions)))
+        for room_num in rng.sample(hotel.treap.InOrder(), 30):
+            hotel.delete(room_num)
+        for room_num in rng.sample(hotel.treap.InOrder(), 3):
+            hotel.add_manual_room(room_num, replace=True)
+        hotel.add_manual_room(10 ** 9 + i)
+        if i == 2:
+            hotel.add_dimension("c")
+        if i == 4:
+            hotel.remove_dimension("a")
+
+
+def mixed_operations_after_compaction(hotel, rng):
+    hotel.mark_all_guests_as_old()
+    hotel.add_rooms_bulk(random_rows(rng, 50, len(hotel.dimensions)))
+    for room_num in rng.sample(hotel.treap.InOrder(), 20):
+        hotel.delete(room_num)
+    hotel.add_manual_room(hotel.treap.InOrder()[0], replace=True)
+
+
+def state(hotel):
+    return list(hotel.export_rows()), hotel.guest_counters()
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_counters_match_full_scan(config):
+    hotel = Hotel(**config)
+    mixed_operations(hotel, random.Random(1))
+    assert hotel.check_counters() == []
+    assert hotel.guest_count() == len(hotel.treap)
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_snapshot_round_trip(config, tmp_path):
+    hotel = Hotel(**config)
+    mixed_operations(hotel, random.Random(2))
+    path = str(tmp_path / "hotel.snap")
+    assert hotel.save_snapshot(path)
+
+    loaded = Hotel(**config)
+    assert loaded.load_snapshot(path)
+    assert state(loaded) == state(hotel)
+    assert loaded.check_counters() == []
+    for way in loaded.dimensions:
+        assert [room for room, _ in loaded.track_range(way, 0, 6)] == [
+            room for room, _ in hotel.track_range(way, 0, 6)]
+
+
+# A cut-off snapshot must be refused and leave the loaded hotel untouched.
+@pytest.mark.parametrize("config", CONFIGS)
+def test_truncated_snapshot_is_rejected(config, tmp_path):
+    hotel = Hotel(**config)
+    mixed_operations(hotel, random.Random(4), rounds=2)
+    path = str(tmp_path / "hotel.snap")
+    assert hotel.save_snapshot(path)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    loaded = Hotel(**config)
+    mixed_operations(loaded, random.Random(5), rounds=1)
+    before = state(loaded)
+    for size in (len(data) - 8, len(data) // 2, 200, 10, 0):
+        cut = str(tmp_path / f"cut{size}.snap")
+        with open(cut, "wb") as f:
+            f.write(data[:size])
+        assert not loaded.load_snapshot(cut)
+        assert state(loaded) == before
+        assert loaded.check_counters() == []
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_journal_replay(config, tmp_path):
+    snapshot_path = str(tmp_path / "hotel.snap")
+    journal_path = str(tmp_path / "hotel.wal")
+    rng = random.Random(3)
+
+    hotel = Hotel(**config)
+    assert hotel.open_journal(journal_path, fsync_interval=0)
+    mixed_operations(hotel, rng, rounds=3)
+    assert hotel.compact_journal(snapshot_path)
+    mixed_operations_after_compaction(hotel, rng)
+    hotel.close_journal()
+
+    recovered = Hotel(**config)
+    assert recovered.load_snapshot(snapshot_path)
+    assert recovered.open_journal(journal_path)
+    recovered.close_journal()
+    assert state(recovered) == state(hotel)
+    assert recovered.check_counters() == []
+
+
+# The new snapshot and its rename must both be on disk before the journal
+# they replace is emptied.
+def test_compaction_syncs_snapshot_before_reset(tmp_path, monkeypatch):
+    snapshot_path = str(tmp_path / "hotel.snap")
+    hotel = Hotel()
+    hotel.add_dimension("a")
+    assert hotel.open_journal(str(tmp_path / "hotel.wal"), fsync_interval=0)
+    hotel.add_rooms_bulk([[i] for i in range(10)])
+    events = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        status = os.fstat(fd)
+        events.append("dir" if stat.S_ISDIR(status.st_mode) else status.st_ino)
+        fsync(fd)
+
+    reset = hotel.journal.reset
+
+    def recording_reset(generation):
+        events.append("reset")
+        reset(generation)
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    monkeypatch.setattr(hotel.journal, "reset", recording_reset)
+    assert hotel.compact_journal(snapshot_path)
+    hotel.close_journal()
+    reset_at = events.index("reset")
+    assert os.stat(snapshot_path).st_ino in events[:reset_at]
+    assert "dir" in events[:reset_at]
+    assert events.index(os.stat(snapshot_path).st_ino) < events.index("dir")
+
+
+# Opening the journal before its snapshot must not throw the journal away.
+def test_newer_journal_is_left_alone(tmp_path):
+    snapshot_path = str(tmp_path / "hotel.snap")
+    journal_path = str(tmp_path / "hotel.wal")
+    hotel = Hotel()
+    hotel.add_dimension("a")
+    assert hotel.open_journal(journal_path, fsync_interval=0)
+    hotel.add_rooms_bulk([[i] for i in range(10)])
+    assert hotel.compact_journal(snapshot_path)
+    hotel.add_rooms_bulk([[i] for i in range(10, 20)])
+    hotel.close_journal()
+    with open(journal_path, "rb") as f:
+        journal = f.read()
+
+    recovered = Hotel()
+    assert not recovered.open_journal(journal_path)
+    assert recovered.journal is None
+    with open(journal_path, "rb") as f:
+        assert f.read() == journal
+    assert recovered.load_snapshot(snapshot_path)
+    assert recovered.open_journal(journal_path)
+    recovered.close_journal()
+    assert recovered.guest_count() == 20
+    assert state(recovered) == state(hotel)
+
+
+# next_free_room decides every collision placement, so it is checked at
+# every room of runs of various lengths, for each treap kind.
+@pytest.mark.parametrize("treap", ["node", "array", "persistent"])
+def test_room_order_queries(treap):
+    rng = random.Random(8)
+    hotel = Hotel(treap=treap)
+    hotel.add_dimension("a")
+    hotel.add_rooms_bulk(random_rows(rng, 300, 1, max_value=40))
+    for room_num in rng.sample(hotel.treap.InOrder(), 60):
+        hotel.delete(room_num)
+    start = 5000
+    for length in (1, 2, 3, 7, 8, 9, 64, 100):
+        for room_num in range(start, start + length):
+            hotel.add_manual_room(room_num)
+        start += length + 1 + length % 3
+    rooms = sorted(hotel.treap.InOrder())
+    occupied = set(rooms)
+
+    for k in range(len(rooms) + 2):
+        assert hotel.kth_room(k) == (rooms[k - 1] if 1 <= k <= len(rooms) else None)
+    for probe in list(range(4990, start + 5)) + rng.sample(range(10 ** 6), 100):
+        assert hotel.rooms_below(probe) == bisect.bisect_left(rooms, probe)
+        free = probe
+        while free in occupied:
+            free += 1
+        assert hotel.next_free_room(probe) == free
+        after = bisect.bisect_right(rooms, probe)
+        assert hotel.next_room(probe) == (rooms[after] if after < len(rooms) else None)
+        before = bisect.bisect_left(rooms, probe)
+        assert hotel.previous_room(probe) == (rooms[before - 1] if before else None)
+    assert [room for page in hotel.iter_rooms(7, 5000) for room in page] == [
+        room for room in rooms if room >= 5000]
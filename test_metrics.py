@@ -0,0 +1,60 @@
+import random
+import sys
+import time
+
+import pytest
+
+from Hotel import Hotel
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+# The reporter thread runs while the owning thread keeps changing the treap
+# and hash table; it must only ever see gauges that thread published.
+@pytest.mark.parametrize("treap", ["node", "array"])
+def test_reporter_reads_published_gauges(treap, fast_switching, capsys):
+    hotel = Hotel(treap=treap, bloom=True)
+    hotel.add_dimension("a")
+    hotel.add_dimension("b")
+    hotel.metrics.enable()
+    snapshots = []
+    hotel.metrics.start_reporter(0.001, snapshots.append)
+    rng = random.Random(0)
+    try:
+        for _ in range(60):
+            hotel.add_rooms_bulk([[rng.randint(0, 9), rng.randint(0, 9)] for _ in range(40)])
+            for room_num in rng.sample(hotel.treap.InOrder(), 30):
+                hotel.delete(room_num)
+        assert hotel.metrics.reporter.is_alive()
+    finally:
+        hotel.metrics.stop_reporter()
+    assert "Error reporting metrics" not in capsys.readouterr().err
+    assert snapshots
+    gauges = snapshots[-1]["gauges"]
+    assert gauges["rooms"] <= hotel.guest_count() + 40
+    assert "treap_depth_max" in gauges
+
+
+def test_reporter_survives_failing_sink(capsys):
+    hotel = Hotel()
+    hotel.metrics.enable()
+    calls = []
+
+    def sink(snapshot):
+        calls.append(snapshot)
+        if len(calls) == 1:
+            raise RuntimeError("sink down")
+
+    hotel.metrics.start_reporter(0.001, sink)
+    deadline = time.monotonic() + 5
+    while len(calls) < 3 and time.monotonic() < deadline:
+        hotel.guest_count()
+    hotel.metrics.stop_reporter()
+    assert len(calls) >= 3
+    assert "sink down" in capsys.readouterr().err
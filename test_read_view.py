@@ -0,0 +1,95 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from Hotel import Hotel
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def make_hotel(storage, table, rooms=600, seed=0):
+    rng = random.Random(seed)
+    hotel = Hotel(treap="persistent", storage=storage, table=table)
+    hotel.add_dimension("a")
+    hotel.add_dimension("b")
+    hotel.add_rooms_bulk([[rng.randint(0, 6), rng.randint(0, 6)] for _ in range(rooms)], is_initial=True)
+    return hotel, rng
+
+
+def tracked(hotel_or_view, value):
+    return [(room_num, dict(details)) for room_num, details in hotel_or_view.track_by_dimension("a", value)]
+
+
+# Arrivals keep landing on, and leaving, the values the reader looks up;
+# every lookup must still see exactly the rooms of the pinned version.
+@pytest.mark.parametrize("storage,table", [("dict", "chained"), ("columnar", "incremental")])
+def test_reads_race_writes(storage, table, fast_switching):
+    hotel, rng = make_hotel(storage, table)
+    expected = {value: tracked(hotel, value) for value in range(7)}
+    rooms = list(hotel.export_rows())
+    view = hotel.snapshot()
+    done = threading.Event()
+    failures = []
+
+    def read():
+        try:
+            for i in range(3000):
+                value = i % 7
+                if tracked(view, value) != expected[value]:
+                    failures.append(value)
+        except Exception as e:
+            failures.append(e)
+        finally:
+            done.set()
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    while not done.is_set():
+        added = hotel.add_rooms_bulk([[rng.randint(0, 6), rng.randint(0, 6)] for _ in range(5)])
+        for room_num in rng.sample(hotel.treap.InOrder(), 4) + added[:2]:
+            hotel.delete(room_num)
+    reader.join()
+    assert failures == []
+    assert list(view.export_rows()) == rooms
+    view.close()
+
+
+def test_export_while_writing_matches_pinned_state(tmp_path):
+    hotel, rng = make_hotel("columnar", "chained", rooms=3000)
+    before = str(tmp_path / "before.csv")
+    during = str(tmp_path / "during.csv")
+    assert hotel.write_file(before)
+    with hotel.snapshot() as view:
+        writer = threading.Thread(target=view.write_file, args=(during,))
+        writer.start()
+        for _ in range(50):
+            hotel.add_rooms_bulk([[rng.randint(0, 6), rng.randint(0, 6)] for _ in range(20)])
+            for room_num in rng.sample(hotel.treap.InOrder(), 10):
+                hotel.delete(room_num)
+        hotel.remove_dimension("b")
+        writer.join()
+    with open(before) as f, open(during) as g:
+        assert f.read() == g.read()
+
+
+def test_closed_views_are_reclaimed():
+    hotel, rng = make_hotel("columnar", "chained")
+    view = hotel.snapshot()
+    for room_num in rng.sample(hotel.treap.InOrder(), 100):
+        hotel.delete(room_num)
+    hotel.add_rooms_bulk([[1, 1]] * 50)
+    assert hotel.hash.history
+    view.close()
+    hotel.add_rooms_bulk([[2, 2]])
+    assert not hotel.hash.history
+    assert not hotel.store.retired
+    assert all(not index.born and not index.retired for index in hotel.indexes.values())
+    assert hotel.check_counters() == []
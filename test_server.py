@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+from Hotel import Hotel
+from Server import HotelServer
+
+
+def make_hotel(treap="persistent"):
+    hotel = Hotel(treap=treap)
+    hotel.add_dimension("a")
+    hotel.add_dimension("b")
+    hotel.add_rooms_bulk([[i % 5, i % 3] for i in range(50)], is_initial=True)
+    return hotel
+
+
+async def with_server(hotel, client):
+    server = HotelServer(hotel)
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            return await client(server, reader, writer)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+            # Let the connection handler see the close before the loop ends.
+            await asyncio.sleep(0.05)
+    finally:
+        listener.close()
+        server.close()
+
+
+async def request(reader, writer, *lines):
+    writer.write("".join(line + "\n" for line in lines).encode())
+    await writer.drain()
+    return [(await reader.readline()).decode().strip() for _ in lines]
+
+
+def test_reads_are_answered_while_a_batch_runs():
+    hotel = make_hotel()
+    room_num = hotel.treap.InOrder()[0]
+    release = threading.Event()
+
+    async def client(server, reader, writer):
+        apply = server.apply
+
+        def slow_apply(batch):
+            release.wait(10)
+            return apply(batch)
+
+        server.apply = slow_apply
+        other_reader, other = await asyncio.open_connection(*writer.get_extra_info("peername"))
+        other.write(b"guest 1 1\n")
+        await other.drain()
+        while server.view is None:
+            await asyncio.sleep(0.01)
+        try:
+            return await asyncio.wait_for(request(reader, writer, f"search {room_num}", "count"), 5)
+        finally:
+            release.set()
+            assert (await other_reader.readline()).startswith(b"OK ")
+            other.close()
+            await other.wait_closed()
+
+    search, count = asyncio.run(with_server(hotel, client))
+    assert search.startswith(f"OK {room_num} ")
+    assert count == "OK 50"
+    assert hotel.guest_count() == 51
+
+
+def test_errors_are_answered_per_command(capsys):
+    hotel = make_hotel(treap="node")
+    room_num = hotel.treap.InOrder()[0]
+    delete = hotel.delete
+
+    def failing_delete(room):
+        if room == room_num:
+            raise RuntimeError("disk full")
+        delete(room)
+
+    hotel.delete = failing_delete
+    other = hotel.treap.InOrder()[1]
+
+    async def client(server, reader, writer):
+        return await request(reader, writer, f"delete {other}", f"delete {room_num}", "guest 4 4",
+                             "manual 1000000007", "manual 1000000007", "count")
+
+    responses = asyncio.run(with_server(hotel, client))
+    assert responses[0] == "OK"
+    assert responses[1] == "ERR disk full"
+    assert responses[2].startswith("OK ")
+    assert responses[3] == "OK"
+    assert responses[4] == "ERR Discarded"
+    assert responses[5] == "OK 51"
+    assert "manual room" not in capsys.readouterr().out
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from Hotel import Hotel
+from RoomNumber import initial_matrix
+from ShardedHotel import ShardedHotel
+
+SHARDINGS = [
+    dict(partition="hash", block_size=64),
+    dict(partition="range", bounds=[40, 300, 5000]),
+    dict(partition="range"),
+]
+
+
+@pytest.fixture(params=SHARDINGS, ids=["hash", "range", "range-unbounded"])
+def hotels(request):
+    sharded = ShardedHotel(4, **request.param)
+    yield Hotel(), sharded
+    sharded.close()
+
+
+# Tiny segments make guests overflow into their neighbours' segments all
+# the time; every guest must still get the room a single hotel gives it.
+def test_arrivals_match_single_hotel(hotels):
+    rng = random.Random(4)
+    extra = [[rng.randint(0, 5) for _ in range(3)] for _ in range(1500)]
+    results = []
+    for hotel in hotels:
+        for way in ("a", "b", "c"):
+            hotel.add_dimension(way)
+        initial = hotel.add_rooms_bulk(initial_matrix(3000, 3), is_initial=True)
+        hotel.mark_all_guests_as_old()
+        results.append((initial, hotel.add_rooms_bulk(extra)))
+    single, sharded = hotels
+    assert results[0] == results[1]
+    assert sharded.sort() == single.treap.InOrder()
+    for value in range(6):
+        assert sharded.track_by_dimension("a", value) == [
+            (room_num, dict(details)) for room_num, details in single.track_by_dimension("a", value)]
+    assert sharded.guest_status_summary() == single.guest_status_summary()
+
+
+def test_default_sharding_spreads_rooms():
+    with ShardedHotel(4) as sharded:
+        sharded.add_dimension("a")
+        sharded.add_dimension("b")
+        sharded.add_rooms_bulk(initial_matrix(20000, 2), is_initial=True)
+        assert min(sharded.shard_counts()) > 0
+
+
+def test_unbounded_range_rebalances_after_first_arrival():
+    with ShardedHotel(4, partition="range") as sharded:
+        sharded.add_dimension("a")
+        sharded.add_rooms_bulk([[i] for i in range(400)])
+        counts = sharded.shard_counts()
+        assert sum(counts) == 400
+        assert max(counts) - min(counts) <= 2
@@ -0,0 +1,158 @@
+import bisect
+import random
+
+import pytest
+
+from Treap import TREAP_TYPES, ArrayTreap
+
+
+def array_treap(keys):
+    treap = ArrayTreap()
+    treap.build_from_sorted(sorted(keys))
+    return treap
+
+
+# Sizes must match the subtree under every node, or rank/select drift.
+def check_sizes(treap):
+    def walk(node):
+        if node == treap.nil:
+            return 0
+        size = 1 + walk(treap._left(node)) + walk(treap._right(node))
+        assert treap._size(node) == size
+        return size
+    return walk(treap.root)
+
+
+def test_split_at_every_pivot_and_merge_back():
+    keys = list(range(0, 80, 2))
+    for pivot in range(-1, 82):
+        lower = array_treap(keys)
+        upper = lower.split(pivot)
+        assert lower.InOrder() == [key for key in keys if key < pivot]
+        assert upper.InOrder() == [key for key in keys if key >= pivot]
+        assert check_sizes(lower) == len(lower)
+        assert check_sizes(upper) == len(upper)
+        assert upper.keys is lower.keys
+        lower.merge(upper)
+        assert lower.InOrder() == keys
+        assert len(upper) == 0
+        assert check_sizes(lower) == len(keys)
+
+
+def test_merge_independent_treaps():
+    lower = array_treap(range(50))
+    upper = array_treap(range(100, 130))
+    lower.merge(upper)
+    assert lower.InOrder() == list(range(50)) + list(range(100, 130))
+    assert check_sizes(lower) == 80
+    assert [lower.select(k) for k in (0, 49, 50, 79)] == [0, 49, 100, 129]
+    assert len(upper) == 0
+
+    empty = ArrayTreap()
+    empty.merge(array_treap([3, 4]))
+    assert empty.InOrder() == [3, 4]
+    empty.merge(ArrayTreap())
+    assert empty.InOrder() == [3, 4]
+
+
+def test_merge_rejects_overlapping_keys():
+    lower = array_treap(range(10))
+    try:
+        lower.merge(array_treap([5, 20]))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("overlapping merge was accepted")
+    assert lower.InOrder() == list(range(10))
+
+
+# Both halves share one set of node arrays after a split; growing and
+# shrinking either must leave the other intact.
+def test_add_and_delete_on_both_halves_after_split():
+    rng = random.Random(6)
+    keys = sorted(rng.sample(range(10000), 400))
+    lower = array_treap(keys)
+    upper = lower.split(5000)
+    low_model = [key for key in keys if key < 5000]
+    high_model = [key for key in keys if key >= 5000]
+    for _ in range(300):
+        for treap, model, lo, hi in ((lower, low_model, 0, 4999), (upper, high_model, 5000, 9999)):
+            key = rng.randint(lo, hi)
+            if key in model:
+                assert treap.delete(key)
+                model.remove(key)
+            else:
+                treap.add(key)
+                model.append(key)
+                model.sort()
+    assert lower.InOrder() == low_model
+    assert upper.InOrder() == high_model
+    assert check_sizes(lower) == len(low_model)
+    assert check_sizes(upper) == len(high_model)
+    lower.merge(upper)
+    assert lower.InOrder() == low_model + high_model
+    assert check_sizes(lower) == len(low_model) + len(high_model)
+
+
+def test_merge_after_one_half_is_rebuilt():
+    lower = array_treap(range(20))
+    upper = lower.split(10)
+    upper.add_sorted([30, 31])
+    assert upper.keys is not lower.keys
+    lower.add(5)
+    lower.merge(upper)
+    assert lower.InOrder() == list(range(20)) + [30, 31]
+    assert len(upper) == 0
+    assert check_sizes(lower) == 22
+
+
+# Every ordered query against a sorted list, after random adds and deletes
+# and after add_sorted merges a batch into a populated treap.
+def check_against_model(treap, model, rng):
+    assert treap.InOrder() == model
+    assert len(treap) == len(model)
+    assert treap.min() == (model[0] if model else None)
+    assert treap.max() == (model[-1] if model else None)
+    for k in range(-1, len(model) + 1):
+        assert treap.select(k) == (model[k] if 0 <= k < len(model) else None)
+    probes = [rng.randint(-5, 3005) for _ in range(200)] + model[::7]
+    for probe in probes:
+        i = bisect.bisect_left(model, probe)
+        j = bisect.bisect_right(model, probe)
+        assert treap.contains(probe) == (i < j)
+        assert treap.rank(probe) == i
+        assert treap.successor(probe) == (model[j] if j < len(model) else None)
+        assert treap.predecessor(probe) == (model[i - 1] if i else None)
+        assert list(treap.iter_from(probe)) == model[i:]
+        hi = probe + rng.randint(0, 300)
+        assert treap.range(probe, hi) == model[i:bisect.bisect_right(model, hi)]
+    assert list(treap.iter_from()) == model
+    page_size = rng.randint(1, 40)
+    start = rng.choice(probes)
+    tail = model[bisect.bisect_left(model, start):]
+    assert list(treap.pages(page_size, start)) == [
+        tail[i:i + page_size] for i in range(0, len(tail), page_size)]
+
+
+@pytest.mark.parametrize("kind", list(TREAP_TYPES))
+def test_ordered_queries_match_sorted_list(kind):
+    rng = random.Random(7)
+    treap = TREAP_TYPES[kind]()
+    model = []
+    check_against_model(treap, model, rng)
+    for key in rng.sample(range(3000), 400):
+        treap.add(key)
+        bisect.insort(model, key)
+    check_against_model(treap, model, rng)
+    for key in rng.sample(model, 150):
+        treap.delete(key)
+        model.remove(key)
+    check_against_model(treap, model, rng)
+    batch = sorted(set(rng.sample(range(3000), 300)) - set(model))
+    treap.add_sorted(batch)
+    model = sorted(model + batch)
+    check_against_model(treap, model, rng)
+    for key in rng.sample(model, 200):
+        treap.delete(key)
+        model.remove(key)
+    check_against_model(treap, model, rng)